@@ -0,0 +1,47 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# --------------------
+# Token-bucket rate limits, kept in memory per worker.
+#
+# Every key (a client address, a student id) gets a bucket holding up to
+# `burst` tokens that refills at `rate` tokens per second, and each request
+# takes one token. Buckets live in an LRU map capped at `max_keys`; evicting
+# one only forgets that key's history, so memory stays bounded under floods of
+# distinct keys.
+# --------------------
+def retry_after(seconds):
+    # Retry-After value: whole seconds, 1 to 3600
+    return max(1, math.ceil(min(seconds, 3600)))
+
+
+class TokenBuckets:
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()        # key -> [tokens, last refill (monotonic)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key):
+        # 0 if the request may go ahead, else seconds until the next token
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+                b[1] = now
+            if b[0] >= 1:
+                b[0] -= 1
+                return 0
+            return (1 - b[0]) / self.rate if self.rate > 0 else float("inf")
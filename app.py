@@ -1,21 +1,170 @@
-from flask import Flask, jsonify, request, render_template_string, redirect, url_for
-from datetime import datetime, date
-import re
+from flask import Flask, Response, abort, g, jsonify, request, render_template, redirect, url_for
+from datetime import datetime, date, timedelta
+import atexit
+import base64
+from bisect import bisect_right
+from contextlib import contextmanager
+import csv
+import io
+from itertools import islice
+import json
+import os
+import tempfile
+import threading
+import time
+
+import click
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from admission import TokenBuckets, retry_after
+from assets import IMMUTABLE, AssetManifest
+from bitmaps import AttendanceBitmaps
+from cache import ResponseCache
+from feed import ChangeFeed
+from importer import FORMATS as IMPORT_FORMATS, detect_format, import_students, iter_rows
+from metrics import RequestMetrics
+from persistence import Journal
+from profiler import SORT_KEYS as PROFILE_SORTS, RequestProfiler
+from rollup import AttendanceRollups, group_key
+from scheduler import DailyJob
+from sqlite_store import SQLiteFeed, SQLiteRollups, open_sqlite
+from store import AttendanceStore, RWLock, StudentStore, login_name
+from writequeue import GroupCommitQueue
+
+app = Flask(__name__, static_folder=None)     # static/ is served by static_asset() below
 
-app = Flask(__name__)
+# --------------------
+# Config (override with FLASK_-prefixed env vars, e.g. FLASK_DATA_DIR=/var/lib/attendance)
+# --------------------
+app.config.from_mapping(
+    STORAGE_BACKEND="memory",       # memory | sqlite (sqlite shares state across gunicorn workers)
+    SQLITE_PATH="attendance.db",
+    DATA_DIR=None,                  # set to keep an append-only log + snapshots there
+    JOURNAL_FSYNC="interval",       # always | interval | never
+    JOURNAL_FSYNC_INTERVAL_MS=50,   # group-commit window for the "interval" policy
+    SNAPSHOT_EVERY=10000,           # log records between snapshots
+    IMPORT_CHUNK_SIZE=500,          # rows per committed chunk for bulk student imports
+    FEED_MAX_STREAMS=4,             # live dashboard streams per worker; each holds a thread
+                                    # (raise it with async workers), extra clients poll instead
+    FEED_STREAM_SECONDS=300,        # streams end after this; EventSource resumes via Last-Event-ID
+    FEED_KEEPALIVE_SECONDS=15,
+    FEED_RETENTION=100000,          # events kept for resuming; with sqlite the bitmaps
+                                    # catch up from it, so keep it above a day of marks
+    RESPONSE_CACHE_ENTRIES=256,     # encoded list responses kept per worker (0 disables)
+    RESPONSE_CACHE_MAX_BYTES=32 * 1024 * 1024,
+    RESPONSE_GZIP_MIN_BYTES=1024,   # smaller bodies are always sent uncompressed
+    PAGE_DEFAULT_LIMIT=100,         # list endpoints page when given ?limit= or ?cursor=
+    PAGE_MAX_LIMIT=1000,
+    SUMMARY_MAX_DAYS=366,           # longest window /api/attendance/summary will add up
+    AUTO_ABSENT_AT=None,            # "HH:MM" server local time: mark everyone unmarked Absent
+    AUTO_ABSENT_WEEKDAYS="mon,tue,wed,thu,fri",
+    SUGGEST_LIMIT=10,               # typeahead matches returned by default
+    SUGGEST_MAX_LIMIT=50,
+    ATTENDANCE_BATCH_MAX=256,       # single POST /api/attendance marks applied per group commit
+    ATTENDANCE_BATCH_WAIT_MS=2,     # how long a flush waits for more marks (0 = only what queued)
+    METRICS_ENABLED=True,           # per-route counts + latency histograms on /metrics
+    METRICS_DIR=None,               # per-worker files summed by /metrics; defaults next to the
+                                    # sqlite file, under DATA_DIR, or in a temp dir per master
+    METRICS_FLUSH_SECONDS=5,
+    METRICS_BUCKETS_MS="5,10,25,50,100,250,500,1000,2500,5000",
+    PROFILE_ENABLED=False,          # cProfile sampled requests (no hooks at all when off)
+    PROFILE_SAMPLE_RATE=0.0,        # fraction of requests profiled, e.g. 0.01
+    PROFILE_TOKEN=None,             # X-Profile-Token value that forces a profile and opens
+                                    # /api/admin/profile
+    PROFILE_DIR=None,               # defaults to <tmp>/attendance-profiles
+    PROFILE_KEEP=500,               # newest profile files kept (shared by all workers)
+    RATE_LIMIT_ENABLED=True,        # token buckets on /api/login and POST /api/attendance
+    RATE_LIMIT_CLIENT_PER_SECOND=20,    # per client address; kiosks log a whole class in
+    RATE_LIMIT_CLIENT_BURST=100,
+    RATE_LIMIT_STUDENT_PER_MINUTE=6,    # per student id: login retries and marks
+    RATE_LIMIT_STUDENT_BURST=5,
+    RATE_LIMIT_MAX_KEYS=10000,      # buckets kept per limiter (least recently used evicted)
+    # per worker; beyond it requests get 429 at once (0 = no cap). Defaults to the
+    # gthread threads (Procfile: GUNICORN_THREADS) less the stream slots and one spare,
+    # so a free thread answers the 429s instead of requests queueing inside gunicorn.
+    # It also bounds the group-commit batches of POST /api/attendance per worker, so
+    # raise GUNICORN_THREADS (threads are cheap here) for bigger batches
+    MAX_INFLIGHT_REQUESTS=None,
+    # proxies in front of the app whose X-Forwarded-For / -Proto are trusted, so
+    # rate limits see the real client; Heroku's router is one (it sets DYNO)
+    TRUSTED_PROXY_HOPS=1 if "DYNO" in os.environ else 0,
+)
+app.config.from_prefixed_env()
+
+if app.config["MAX_INFLIGHT_REQUESTS"] is None:
+    app.config["MAX_INFLIGHT_REQUESTS"] = max(
+        1, int(os.environ.get("GUNICORN_THREADS", 8)) - app.config["FEED_MAX_STREAMS"] - 1)
+
+if app.config["TRUSTED_PROXY_HOPS"]:
+    hops = app.config["TRUSTED_PROXY_HOPS"]
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
 
 # --------------------
-# In-memory "database"
+# Storage: in-memory "database" (default) or SQLite
 # --------------------
-students = [
+SEED_STUDENTS = [
     {"id": 1, "name": "John Doe", "grade": 10, "section": "Zechariah"},
     {"id": 2, "name": "Jane Smith", "grade": 10, "section": "Zechariah"}
 ]
 
-# attendance entries: list of { student_id: int, status: "Present"/"Absent", timestamp: ISO, date: "YYYY-MM-DD" }
-attendance = [
+# one reader/writer lock guards both stores, so readers never block each other and
+# cross-store writes (delete a student + their attendance) are atomic
+store_lock = RWLock()
+
+# students: id -> record map with grade / section / (grade, section) indexes
+students = StudentStore(lock=store_lock)
+
+# attendance entries: { student_id: int, status: "Present"/"Absent", timestamp: ISO, date: "YYYY-MM-DD" }
+# indexed by date and by student so duplicate checks and per-day/per-student reads are O(1)
+attendance = AttendanceStore([
     # example: {"student_id": 1, "status": "Present", "timestamp": "2025-10-26T08:00:00Z", "date": "2025-10-26"}
-]
+], lock=store_lock)
+
+# the sqlite backend exposes the same store interface, so the helpers and routes
+# below work unchanged against either
+db = None
+if app.config["STORAGE_BACKEND"] == "sqlite":
+    db, students, attendance = open_sqlite(app.config["SQLITE_PATH"])
+    store_lock = db      # write() is a (re-entrant) IMMEDIATE transaction
+elif app.config["STORAGE_BACKEND"] != "memory":
+    raise RuntimeError(f"unknown STORAGE_BACKEND {app.config['STORAGE_BACKEND']!r}")
+
+# optional durability for the memory backend: every mutation below is appended to the
+# journal, and startup restores the latest snapshot plus the log tail
+journal = None
+if db is None and app.config["DATA_DIR"]:
+    journal = Journal(app.config["DATA_DIR"],
+                      fsync=app.config["JOURNAL_FSYNC"],
+                      fsync_interval_ms=app.config["JOURNAL_FSYNC_INTERVAL_MS"],
+                      snapshot_every=app.config["SNAPSHOT_EVERY"])
+    journal.recover(students, attendance)
+    atexit.register(journal.close)
+
+# change feed behind the live dashboard stream; with sqlite it is a table so
+# events from every worker reach every stream
+feed = (SQLiteFeed(db, capacity=app.config["FEED_RETENTION"]) if db is not None
+        else ChangeFeed(capacity=app.config["FEED_RETENTION"]))
+feed_slots = threading.BoundedSemaphore(app.config["FEED_MAX_STREAMS"])
+
+# per day / grade / section status counters behind /api/attendance/summary; the
+# memory ones are recounted once here (after journal replay), then kept by the helpers
+rollups = SQLiteRollups(db) if db is not None else AttendanceRollups(lock=store_lock)
+rollups.rebuild(students, attendance)
+
+# per-student present/absent bitmaps over school days (history, streaks, absence
+# reports). Memory: built once here, then kept by the helpers like the rollups.
+# Sqlite: they follow the change feed, so every worker sees every worker's marks.
+if db is None:
+    bitmaps = AttendanceBitmaps(attendance)
+    bitmaps.rebuild()
+else:
+    bitmaps = AttendanceBitmaps(attendance, feed)
+
+# encoded (and gzipped) bodies of the list endpoints; entries are checked against
+# the store version on every hit and dropped by tag from the mutation helpers
+response_cache = ResponseCache(max_entries=app.config["RESPONSE_CACHE_ENTRIES"],
+                               max_bytes=app.config["RESPONSE_CACHE_MAX_BYTES"],
+                               gzip_min_bytes=app.config["RESPONSE_GZIP_MIN_BYTES"])
 
 # --------------------
 # Helper functions
@@ -27,14 +176,398 @@ def today_str():
     return date.today().isoformat()
 
 def find_student(student_id):
-    return next((s for s in students if s["id"] == student_id), None)
+    return students.get(student_id)
 
 def next_student_id():
-    return (students[-1]["id"] + 1) if students else 1
+    return students.allocate_id()
+
+def validate_student(data):
+    # shared by POST /api/students and the bulk import: (record without id, error)
+    name = data.get('name')
+    grade = data.get('grade')
+    section = data.get('section')
+
+    if not name or grade is None or not section:
+        return None, "name, grade and section are required"
+    try:
+        grade = int(grade)
+    except (TypeError, ValueError):
+        return None, "grade must be integer"
+    return {"name": str(name).strip(), "grade": grade, "section": str(section).strip()}, None
+
+def parse_date(value):
+    # validate a YYYY-MM-DD query parameter, returning it normalized
+    return date.fromisoformat(value).isoformat()
+
+def date_window():
+    # optional from/to query parameters, normalized; raises ValueError
+    start = parse_date(request.args['from']) if request.args.get('from') else None
+    end = parse_date(request.args['to']) if request.args.get('to') else None
+    return start, end
 
 def get_attendance_for_student_and_date(student_id, date_str=None):
     d = date_str or today_str()
-    return [a for a in attendance if a["student_id"] == student_id and a["date"] == d]
+    a = attendance.get(student_id, d)
+    return [a] if a else []
+
+def not_modified(version):
+    # 304 when the client's validators still match version = (etag token, modified).
+    # If-None-Match wins; If-Modified-Since only has whole-second resolution.
+    token, modified = version
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(token)
+    elif request.if_modified_since:
+        matched = int(modified) <= request.if_modified_since.timestamp()
+    else:
+        matched = False
+    return with_validators(Response(status=304), version) if matched else None
+
+def with_validators(resp, version):
+    token, modified = version
+    resp.set_etag(token, weak=True)
+    resp.last_modified = int(modified)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+def cached_json(key, version, tags, build):
+    # JSON response for key at version, encoding build() only on a cache miss (compact,
+    # like jsonify outside debug mode)
+    entry = response_cache.get(key, version[0])
+    if entry is None:
+        body = (app.json.dumps(build(), separators=(",", ":")) + "\n").encode()
+        entry = response_cache.put(key, version[0], body, tags)
+    resp = Response(entry.body, mimetype=app.json.mimetype)
+    resp.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip']:
+        gzipped = response_cache.gzipped(entry)
+        if gzipped is not None:
+            resp.set_data(gzipped)
+            resp.headers['Content-Encoding'] = 'gzip'
+    return with_validators(resp, version)
+
+# --------------------
+# Paging and projection for the list endpoints. A cursor is the (opaque, base64)
+# sort key of the last row returned; the next page starts strictly after it.
+# --------------------
+STUDENT_FIELDS = ("id", "name", "grade", "section")
+ATTENDANCE_FIELDS = ("student_id", "status", "timestamp", "date")
+ATTENDANCE_STATUSES = ("Present", "Absent", "Late", "Excused")
+
+def valid_status(status):
+    return isinstance(status, str) and status in ATTENDANCE_STATUSES
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise ValueError("invalid cursor")
+
+def student_key(key):
+    if type(key) is not int:
+        raise ValueError("invalid cursor")
+    return key
+
+def attendance_key(key):
+    if not (isinstance(key, list) and len(key) == 2 and isinstance(key[0], str) and type(key[1]) is int):
+        raise ValueError("invalid cursor")
+    return tuple(key)
+
+def page_args(check_key):
+    # (limit, key to start after) from ?limit=&cursor=; limit is None when unpaged
+    limit, cursor = request.args.get('limit'), request.args.get('cursor')
+    if limit is None and cursor is None:
+        return None, None
+    try:
+        limit = int(limit) if limit else app.config['PAGE_DEFAULT_LIMIT']
+    except ValueError:
+        raise ValueError("limit must be integer")
+    if not 1 <= limit <= app.config['PAGE_MAX_LIMIT']:
+        raise ValueError(f"limit must be between 1 and {app.config['PAGE_MAX_LIMIT']}")
+    return limit, check_key(decode_cursor(cursor)) if cursor else None
+
+def parse_fields(allowed):
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+    if not fields or any(f not in allowed for f in fields):
+        raise ValueError(f"fields must be a comma-separated subset of {', '.join(allowed)}")
+    return fields
+
+def page_payload(name, rows, limit, key, fields):
+    # rows holds up to limit + 1 items when paging; the extra one only signals a next page
+    payload = {"status": "success"}
+    if limit is not None:
+        more = len(rows) > limit
+        rows = rows[:limit]
+        payload["next_cursor"] = encode_cursor(key(rows[-1])) if more else None
+    payload[name] = rows if fields is None else [{f: r[f] for f in fields} for r in rows]
+    return payload
+
+def entry_key(e):
+    return e["date"], e["student_id"]
+
+def with_students(entries):
+    # expand=student: name/grade/section joined onto each entry with one batch lookup
+    found = students.get_many({e["student_id"] for e in entries})
+    joined = {sid: {"name": s["name"], "grade": s["grade"], "section": s["section"]}
+              for sid, s in found.items()}
+    return [{**e, "student": joined.get(e["student_id"])} for e in entries]
+
+def day_tags(dates):
+    return [f"day:{d}" for d in dates] + ["attendance:range"]
+
+# --------------------
+# Mutations: every write to the stores goes through these so it can be journaled.
+# Each one holds the write lock for the whole change, journal append included.
+# --------------------
+@contextmanager
+def mutating():
+    with store_lock.write():
+        yield
+    if journal:
+        journal.commit()     # fsync (group commit) once the lock is released
+
+def add_student(record):
+    with mutating():
+        students.add(record)
+        if journal:
+            journal.append("student.add", student=record)
+        response_cache.invalidate("roster")
+    return record
+
+def add_students(records):
+    # one committed import chunk: ids are assigned as a block, one write + journal record
+    with mutating():
+        first = students.allocate_ids(len(records))
+        for offset, record in enumerate(records):
+            record["id"] = first + offset
+        students.add_many(records)
+        if journal:
+            journal.append("student.add_many", students=records)
+        response_cache.invalidate("roster")
+    return records
+
+def update_student(student_id, **fields):
+    with mutating():
+        old = students.get(student_id)
+        s = students.update(student_id, **fields)
+        if s:
+            if group_key(old) != group_key(s):
+                rollups.move(attendance.for_student(student_id), old, s)
+            if journal:
+                journal.append("student.update", id=student_id, fields=fields)
+        response_cache.invalidate("roster")
+    return s
+
+def delete_student(student_id):
+    with mutating():
+        s = students.delete(student_id)
+        if s:
+            for e in attendance.for_student(student_id):
+                rollups.remove(e, s)
+            if journal:
+                journal.append("student.delete", id=student_id)
+        response_cache.invalidate("roster")
+        # remove attendance entries for that student (optional)
+        if attendance.delete_student(student_id):
+            bitmaps.delete_student(student_id)
+            if journal:
+                journal.append("attendance.delete_student", student_id=student_id)
+            response_cache.invalidate("attendance")
+            feed.publish("attendance.delete_student", {"student_id": student_id})
+    return s
+
+def add_attendance_many(entries):
+    # one write lock and one journal record for the whole batch; returns a
+    # created flag per entry (False = already marked that day). Everything that
+    # can fail runs before the first change, so a bad entry leaves nothing behind.
+    for e in entries:
+        if not valid_status(e.get("status")):
+            raise ValueError(f"invalid attendance status {e.get('status')!r}")
+    with mutating():
+        found = students.get_many({e["student_id"] for e in entries})
+        created = attendance.add_many(entries)
+        added = [e for e, ok in zip(entries, created) if ok]
+        for e in added:
+            s = found.get(e["student_id"])
+            if s:
+                rollups.add(e, s)
+            bitmaps.add(e)
+        if journal and added:
+            journal.append("attendance.add_many", entries=added)
+        if added:
+            response_cache.invalidate(*day_tags({e["date"] for e in added}))
+        for e in added:
+            feed.publish("attendance.add", e)
+    return created
+
+# single marks from POST /api/attendance: concurrent requests are applied together
+# (one lock, duplicate check pass, journal record / sqlite transaction per batch)
+attendance_queue = GroupCommitQueue(add_attendance_many,
+                                    max_batch=app.config["ATTENDANCE_BATCH_MAX"],
+                                    max_wait_ms=app.config["ATTENDANCE_BATCH_WAIT_MS"])
+
+def clear_attendance(date_str):
+    with mutating():
+        cleared = attendance.clear_date(date_str)
+        if cleared:
+            rollups.clear_date(date_str)
+            bitmaps.clear_date(date_str)
+            if journal:
+                journal.append("attendance.clear", date=date_str)
+            response_cache.invalidate(*day_tags([date_str]))
+            feed.publish("attendance.clear", {"date": date_str, "cleared": cleared})
+    return cleared
+
+def unmarked_ids(date_str, grade=None, section=None):
+    # roster minus the students marked that day, both sides straight from the indexes
+    return students.ids(grade=grade, section=section) - attendance.marked_ids(date_str)
+
+def mark_unmarked_absent(day):
+    # the end-of-day job: one batch of Absent entries for everyone not marked yet
+    d = day.isoformat()
+    timestamp = now_iso()
+    entries = [{"student_id": sid, "status": "Absent", "timestamp": timestamp, "date": d}
+               for sid in sorted(unmarked_ids(d))]
+    created = sum(add_attendance_many(entries)) if entries else 0
+    app.logger.info("auto-absent %s: %d students marked Absent", d, created)
+    return created
+
+def seed_students():
+    # only on a brand-new store; with sqlite several workers may race to do this
+    fresh = db.fresh if db is not None else (journal is None or journal.fresh)
+    if not fresh:
+        return
+    for seed in SEED_STUDENTS:
+        try:
+            add_student(dict(seed))
+        except KeyError:
+            pass
+
+seed_students()
+
+# with sqlite every worker shares the store, so the lock file next to the database
+# lets one of them run the job per day; memory stores are per process
+auto_absent = None
+if app.config["AUTO_ABSENT_AT"]:
+    auto_absent = DailyJob(app.config["AUTO_ABSENT_AT"], mark_unmarked_absent,
+                           weekdays=app.config["AUTO_ABSENT_WEEKDAYS"],
+                           lock_path=app.config["SQLITE_PATH"] + ".auto-absent" if db is not None else None,
+                           logger=app.logger, name="auto-absent")
+    auto_absent.start()
+
+    @app.before_request
+    def ensure_auto_absent():
+        auto_absent.start()      # restarts the thread in workers forked after import (--preload)
+
+# --------------------
+# Request metrics: timed from before_request to after_request (streamed bodies
+# count until the response object is returned, not until the stream ends)
+# --------------------
+def metric_gauges():
+    return {
+        "students": ("Students on the roster.", len(students)),
+        "rows": ("Attendance entries stored.", len(attendance)),
+        "days": ("Days with any attendance.", attendance.day_count()),
+        "response_cache_entries": ("Encoded responses cached by this worker.", len(response_cache)),
+        "response_cache_bytes": ("Bytes held by this worker's response cache.", response_cache.nbytes),
+    }
+
+metrics = None
+if app.config["METRICS_ENABLED"]:
+    metrics_dir = app.config["METRICS_DIR"]
+    if metrics_dir is None and db is not None:
+        metrics_dir = app.config["SQLITE_PATH"] + ".metrics"
+    elif metrics_dir is None and app.config["DATA_DIR"]:
+        metrics_dir = os.path.join(app.config["DATA_DIR"], "metrics")
+    elif metrics_dir is None:
+        # workers of one gunicorn master share a parent pid, and so this directory
+        metrics_dir = os.path.join(tempfile.gettempdir(), f"attendance-metrics-{os.getppid()}")
+    metrics = RequestMetrics(buckets_ms=app.config["METRICS_BUCKETS_MS"], directory=metrics_dir,
+                             flush_seconds=app.config["METRICS_FLUSH_SECONDS"], gauges=metric_gauges)
+
+    @app.before_request
+    def start_timer():
+        metrics.start()          # per worker; restarts the flush thread after a fork
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(resp):
+        started = g.get("request_started")
+        if started is not None:
+            metrics.observe(request.method, request.endpoint or "unmatched", resp.status_code,
+                            time.perf_counter() - started)
+        return resp
+
+# --------------------
+# Profiling: opt-in, sampled or forced per request with the admin token header
+# --------------------
+profiler = None
+if app.config["PROFILE_ENABLED"]:
+    profiler = RequestProfiler(
+        app.config["PROFILE_DIR"] or os.path.join(tempfile.gettempdir(), "attendance-profiles"),
+        sample_rate=float(app.config["PROFILE_SAMPLE_RATE"]),
+        token=app.config["PROFILE_TOKEN"], keep=app.config["PROFILE_KEEP"])
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint != 'api_admin_profile' and profiler.wants(request.headers.get('X-Profile-Token')):
+            g.profile = profiler.start()
+            g.profile_started = time.perf_counter()
+
+    @app.teardown_request
+    def finish_profile(exc):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profiler.finish(profile, request.endpoint or "unmatched",
+                            time.perf_counter() - g.profile_started)
+
+# --------------------
+# Admission control: shed load with a fast 429 + Retry-After instead of queueing.
+# All limits are per worker. Live streams hold a thread for minutes and have
+# their own cap (FEED_MAX_STREAMS), and /metrics must answer while overloaded,
+# so neither is counted here.
+# --------------------
+client_buckets = student_buckets = None
+if app.config["RATE_LIMIT_ENABLED"]:
+    client_buckets = TokenBuckets(app.config["RATE_LIMIT_CLIENT_PER_SECOND"],
+                                  app.config["RATE_LIMIT_CLIENT_BURST"],
+                                  max_keys=app.config["RATE_LIMIT_MAX_KEYS"])
+    student_buckets = TokenBuckets(app.config["RATE_LIMIT_STUDENT_PER_MINUTE"] / 60,
+                                   app.config["RATE_LIMIT_STUDENT_BURST"],
+                                   max_keys=app.config["RATE_LIMIT_MAX_KEYS"])
+
+def too_many_requests(wait, message="Too many requests, try again shortly"):
+    resp = jsonify({"status": "error", "message": message})
+    resp.headers['Retry-After'] = str(retry_after(wait))
+    return resp, 429
+
+def rate_limited(student_id):
+    # seconds to wait, or 0; the client bucket is checked first so a flood of
+    # made-up ids from one client does not fill the student limiter
+    if client_buckets is None:
+        return 0
+    return client_buckets.take(request.remote_addr) or student_buckets.take(student_id)
+
+if app.config["MAX_INFLIGHT_REQUESTS"]:
+    inflight = threading.BoundedSemaphore(app.config["MAX_INFLIGHT_REQUESTS"])
+
+    @app.before_request
+    def admit_request():
+        if request.endpoint in ('api_attendance_stream', 'metrics_endpoint'):
+            return None
+        if not inflight.acquire(blocking=False):
+            return too_many_requests(1, "Server busy, try again shortly")
+        g.admitted = True
+
+    @app.teardown_request
+    def release_request(exc):
+        if g.pop("admitted", False):
+            inflight.release()
 
 # --------------------
 # Basic routes
@@ -53,20 +586,54 @@ def api_get_students():
     grade = request.args.get('grade')
     section = request.args.get('section')
 
-    results = students
-    if q:
-        pattern = re.compile(re.escape(q), re.IGNORECASE)
-        results = [s for s in results if pattern.search(s['name'])]
+    grade_num = None
     if grade:
         try:
-            g = int(grade)
-            results = [s for s in results if s.get('grade') == g]
+            grade_num = int(grade)
         except ValueError:
             return jsonify({"status": "error", "message": "grade must be integer"}), 400
-    if section:
-        results = [s for s in results if s.get('section', '').lower() == section.lower()]
-
-    return jsonify({"status": "success", "students": results}), 200
+    try:
+        fields = parse_fields(STUDENT_FIELDS)
+        limit, after = page_args(student_key)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    # read the version before the data, so a racing write can only make the tag older
+    version = students.version()
+    unchanged = not_modified(version)
+    if unchanged:
+        return unchanged
+
+    def build():
+        # answered from the grade/section indexes, intersected with the name index for q
+        want = limit + 1 if limit is not None else None
+        if q:
+            results = students.search(q, grade=grade_num, section=section or None, after=after, limit=want)
+        else:
+            results = students.query(grade=grade_num, section=section or None, after=after, limit=want)
+        return page_payload("students", results, limit, lambda s: s["id"], fields)
+
+    key = ("students", grade_num, (section or "").lower(), (q or "").lower(), limit, after, fields)
+    return cached_json(key, version, ["roster"], build), 200
+
+@app.route('/api/students/suggest', methods=['GET'])
+def api_suggest_students():
+    # typeahead for the dashboard search box: best name matches first
+    q = (request.args.get('q') or '').strip()
+    try:
+        limit = int(request.args.get('limit') or app.config['SUGGEST_LIMIT'])
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be integer"}), 400
+    limit = max(1, min(limit, app.config['SUGGEST_MAX_LIMIT']))
+    if not q:
+        return jsonify({"status": "success", "students": []}), 200
+
+    version = students.version()
+    unchanged = not_modified(version)
+    if unchanged:
+        return unchanged
+    build = lambda: {"status": "success", "students": students.suggest(q, limit)}
+    return cached_json(("suggest", q.lower(), limit), version, ["roster"], build), 200
 
 @app.route('/api/students/<int:student_id>', methods=['GET'])
 def api_get_student(student_id):
@@ -78,20 +645,40 @@ def api_get_student(student_id):
 @app.route('/api/students', methods=['POST'])
 def api_add_student():
     data = request.get_json() or {}
-    name = data.get('name')
-    grade = data.get('grade')
-    section = data.get('section')
+    new, error = validate_student(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
 
-    if not name or grade is None or not section:
-        return jsonify({"status": "error", "message": "name, grade and section are required"}), 400
+    new = {"id": next_student_id(), **new}
+    add_student(new)
+    return jsonify({"status": "success", "student": new}), 201
+
+@app.route('/api/students/import', methods=['POST'])
+def api_import_students():
+    # streaming bulk import: a multipart "file" upload or a raw CSV / JSONL body.
+    # ?format=csv|jsonl overrides detection from the filename / content type.
+    upload = request.files.get('file')
+    if upload:
+        stream, filename, ctype = upload.stream, upload.filename, upload.content_type
+    else:
+        stream, filename, ctype = request.stream, None, request.content_type
+    fmt = request.args.get('format') or detect_format(filename, ctype)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"status": "error", "message": "format must be csv or jsonl"}), 400
     try:
-        grade = int(grade)
+        chunk_size = max(1, int(request.args.get('chunk_size', app.config['IMPORT_CHUNK_SIZE'])))
     except ValueError:
-        return jsonify({"status": "error", "message": "grade must be integer"}), 400
+        return jsonify({"status": "error", "message": "chunk_size must be integer"}), 400
 
-    new = {"id": next_student_id(), "name": name.strip(), "grade": grade, "section": section.strip()}
-    students.append(new)
-    return jsonify({"status": "success", "student": new}), 201
+    def progress(report):
+        app.logger.info("student import: %d rows read, %d imported", report['rows'], report['imported'])
+
+    try:
+        report = import_students(iter_rows(stream, fmt), validate_student, add_students,
+                                 chunk_size=chunk_size, on_progress=progress)
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"status": "error", "message": f"could not read upload: {e}"}), 400
+    return jsonify({"status": "success", **report}), 200
 
 @app.route('/api/students/<int:student_id>', methods=['PUT'])
 def api_update_student(student_id):
@@ -99,24 +686,23 @@ def api_update_student(student_id):
     if not s:
         return jsonify({"status": "error", "message": "Student not found"}), 404
     data = request.get_json() or {}
-    s['name'] = data.get('name', s['name']).strip()
     try:
-        s['grade'] = int(data.get('grade', s['grade']))
+        grade = int(data.get('grade', s['grade']))
     except ValueError:
         return jsonify({"status": "error", "message": "grade must be integer"}), 400
-    s['section'] = data.get('section', s['section']).strip()
+    # go through the store so the grade/section indexes follow the change
+    s = update_student(student_id,
+                        name=data.get('name', s['name']).strip(),
+                        grade=grade,
+                        section=data.get('section', s['section']).strip())
     return jsonify({"status": "success", "student": s}), 200
 
 @app.route('/api/students/<int:student_id>', methods=['DELETE'])
 def api_delete_student(student_id):
-    global students
     s = find_student(student_id)
     if not s:
         return jsonify({"status": "error", "message": "Student not found"}), 404
-    students = [x for x in students if x['id'] != student_id]
-    # remove attendance entries for that student (optional)
-    global attendance
-    attendance = [a for a in attendance if a['student_id'] != student_id]
+    delete_student(student_id)
     return jsonify({"status": "success", "message": "Student deleted"}), 200
 
 # --------------------
@@ -135,12 +721,15 @@ def api_login():
     except ValueError:
         return jsonify({"status": "error", "message": "id must be integer"}), 400
 
-    s = find_student(student_id)
+    wait = rate_limited(student_id)
+    if wait:
+        return too_many_requests(wait, "Too many login attempts, try again shortly")
+
+    # match name loosely (case-insensitive); the stored side was normalized on write
+    s, name_key = students.login_lookup(student_id)
     if not s:
         return jsonify({"status": "error", "message": "Student not found"}), 404
-
-    # match name loosely (case-insensitive)
-    if s['name'].strip().lower() != name.lower():
+    if name_key != login_name(name):
         return jsonify({"status": "error", "message": "Name does not match the provided ID"}), 401
 
     # success
@@ -151,17 +740,72 @@ def api_login():
 # --------------------
 @app.route('/api/attendance', methods=['GET'])
 def api_get_attendance():
-    # optional filters: student_id, date
+    # optional filters: student_id, date, or a from/to date range (inclusive)
     sid = request.args.get('student_id')
-    d = request.args.get('date') or today_str()
-    results = [a for a in attendance if a['date'] == d]
+    try:
+        start, end = date_window()
+    except ValueError:
+        return jsonify({"status": "error", "message": "from/to must be YYYY-MM-DD dates"}), 400
     if sid:
         try:
             sid = int(sid)
-            results = [a for a in results if a['student_id'] == sid]
         except ValueError:
             return jsonify({"status": "error", "message": "student_id must be integer"}), 400
-    return jsonify({"status": "success", "attendance": results}), 200
+    try:
+        fields = parse_fields(ATTENDANCE_FIELDS)
+        limit, after = page_args(attendance_key)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    expand = request.args.get('expand')
+    if expand not in (None, '', 'student'):
+        return jsonify({"status": "error", "message": "expand must be student"}), 400
+    expand = expand == 'student'
+
+    d = request.args.get('date') or today_str()
+    ranged = bool(start or end)
+    version = attendance.range_version(start, end) if ranged else attendance.day_version(d)
+    if expand:
+        # joined names change with the roster too
+        r_token, r_modified = students.version()
+        version = (f"{version[0]}-{r_token}", max(version[1], r_modified))
+    unchanged = not_modified(version)
+    if unchanged:
+        return unchanged
+
+    want = limit + 1 if limit is not None else None
+    if expand and fields:
+        fields += ("student",)
+    # single-student reads are cheap lookups; whole-day and range listings are cached
+    if sid:
+        if ranged:
+            results = attendance.for_student(sid, start, end)
+        else:
+            results = get_attendance_for_student_and_date(sid, d)
+        if limit is not None:
+            results = [e for e in results if after is None or entry_key(e) > after][:want]
+        if expand:
+            results = with_students(results)
+        payload = page_payload("attendance", results, limit, entry_key, fields)
+        return with_validators(jsonify(payload), version), 200
+
+    first, last = (start, end) if ranged else (d, d)
+    def build():
+        # unpaged reads keep marking order; pages are ordered by (date, student_id)
+        if limit is not None:
+            results = attendance.page(first, last, after=after, limit=want)
+        elif ranged:
+            results = list(attendance.for_range(start, end))
+        else:
+            results = attendance.for_date(d)
+        if expand:
+            results = with_students(results)
+        return page_payload("attendance", results, limit, entry_key, fields)
+
+    tags = ["attendance", "attendance:range"] if ranged else ["attendance", f"day:{d}"]
+    if expand:
+        tags.append("roster")
+    key = ("attendance", first, last, ranged, limit, after, fields, expand)
+    return cached_json(key, version, tags, build), 200
 
 @app.route('/api/attendance', methods=['POST'])
 def api_post_attendance():
@@ -175,318 +819,403 @@ def api_post_attendance():
         return jsonify({"status": "error", "message": "student_id required"}), 400
     try:
         student_id = int(student_id)
-    except ValueError:
+    except (TypeError, ValueError):
         return jsonify({"status": "error", "message": "student_id must be integer"}), 400
+    if not valid_status(status):
+        return jsonify({"status": "error",
+                        "message": f"status must be one of {', '.join(ATTENDANCE_STATUSES)}"}), 400
+
+    wait = rate_limited(student_id)
+    if wait:
+        return too_many_requests(wait)
 
     s = find_student(student_id)
     if not s:
         return jsonify({"status": "error", "message": "Student not found"}), 404
 
-    # prevent duplicate marking for same day (you can allow multiple entries if you want)
-    existing = get_attendance_for_student_and_date(student_id, d)
-    if existing:
-        return jsonify({"status": "error", "message": "Attendance already marked for today"}), 409
-
+    # one mark per student per day; the check runs in the group commit, under the write lock
     entry = {"student_id": student_id, "status": status, "timestamp": timestamp, "date": d}
-    attendance.append(entry)
+    if not attendance_queue.submit(entry):
+        return jsonify({"status": "error", "message": "Attendance already marked for today"}), 409
     return jsonify({"status": "success", "attendance": entry}), 201
 
 # --------------------
-# Admin Dashboard UI, Student Login UI, Attendance UI (single-file, inline HTML/CSS/JS)
+# API - Batch roll call: mark a list of students (or a whole section) in one request
+# --------------------
+@app.route('/api/attendance/batch', methods=['POST'])
+def api_post_attendance_batch():
+    # body: {"marks": [{"student_id": 1, "status": "Present"}, ...]}
+    #   or: {"grade": 10, "section": "Zechariah", "absent": [2, 5]}  (everyone else Present)
+    data = request.get_json() or {}
+    timestamp = now_iso()
+    d = today_str()
+
+    if 'marks' in data:
+        marks = data.get('marks')
+        if not isinstance(marks, list):
+            return jsonify({"status": "error", "message": "marks must be a list"}), 400
+    elif data.get('grade') is not None and data.get('section'):
+        try:
+            grade = int(data['grade'])
+            absent = {int(x) for x in data.get('absent') or []}
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "message": "grade and absent ids must be integers"}), 400
+        if not isinstance(data['section'], str):
+            return jsonify({"status": "error", "message": "section must be a string"}), 400
+        roster = students.query(grade=grade, section=data['section'].strip())
+        if not roster:
+            return jsonify({"status": "error", "message": "No students in that grade/section"}), 404
+        marks = [{"student_id": x['id'], "status": 'Absent' if x['id'] in absent else 'Present'}
+                 for x in roster]
+    else:
+        return jsonify({"status": "error", "message": "marks, or grade and section, are required"}), 400
+
+    # validate every item, look the students up in one go, then apply all marks
+    # under a single write
+    results = [None] * len(marks)
+    parsed = []
+    for i, m in enumerate(marks):
+        raw = m.get('student_id') if isinstance(m, dict) else None
+        try:
+            sid = int(raw)
+        except (TypeError, ValueError):
+            results[i] = {"student_id": raw, "result": "invalid"}
+            continue
+        if not valid_status(m.get('status', 'Present')):
+            results[i] = {"student_id": sid, "result": "invalid"}
+            continue
+        parsed.append((i, sid, m.get('status', 'Present')))
+
+    found = students.get_many({sid for _, sid, _ in parsed})
+    entries, slots = [], []
+    for i, sid, status in parsed:
+        if sid not in found:
+            results[i] = {"student_id": sid, "result": "not-found"}
+            continue
+        entries.append({"student_id": sid, "status": status, "timestamp": timestamp, "date": d})
+        slots.append(i)
+
+    for i, e, created in zip(slots, entries, add_attendance_many(entries)):
+        results[i] = {"student_id": e['student_id'], "result": "created" if created else "duplicate"}
+
+    summary = {k: sum(1 for r in results if r['result'] == k)
+               for k in ('created', 'duplicate', 'not-found', 'invalid')}
+    return jsonify({"status": "success", "date": d, "summary": summary, "results": results}), 200
+
+# --------------------
+# API - Live attendance feed (server-sent events)
+# --------------------
+def iter_sse(cursor, max_seconds, keepalive):
+    yield "retry: 5000\n\n"
+    deadline = time.monotonic() + max_seconds
+    while time.monotonic() < deadline:
+        events = feed.read(cursor, timeout=min(keepalive, max(0, deadline - time.monotonic())))
+        if not events:
+            yield ": keep-alive\n\n"
+            continue
+        chunk = []
+        for event_id, kind, data in events:
+            chunk.append(f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n")
+            cursor = event_id
+        yield "".join(chunk)
+
+@app.route('/api/attendance/stream', methods=['GET'])
+def api_attendance_stream():
+    # new attendance entries, clears and deletes as they happen. EventSource sends
+    # Last-Event-ID on reconnect so nothing is missed; without one we start from now.
+    if not feed_slots.acquire(blocking=False):
+        return jsonify({"status": "error", "message": "Too many live streams, poll instead"}), 503
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor') or feed.cursor()
+    resp = Response(iter_sse(cursor, app.config['FEED_STREAM_SECONDS'], app.config['FEED_KEEPALIVE_SECONDS']),
+                    mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    resp.call_on_close(feed_slots.release)
+    return resp
+
+# --------------------
+# API - Streaming export over a date range (NDJSON or CSV), joined with student details
+# --------------------
+EXPORT_FIELDS = ["date", "student_id", "name", "grade", "section", "status", "timestamp"]
+
+def iter_export_rows(start, end):
+    # rows are produced one day-partition at a time; nothing is materialized.
+    # Students are looked up once per EXPORT_BATCH_ROWS entries, not once per row.
+    entries = iter(attendance.for_range(start, end))
+    while True:
+        chunk = list(islice(entries, EXPORT_BATCH_ROWS))
+        if not chunk:
+            return
+        found = students.get_many({a['student_id'] for a in chunk})
+        for a in chunk:
+            s = found.get(a['student_id']) or {}
+            yield {"date": a['date'], "student_id": a['student_id'], "name": s.get('name'),
+                   "grade": s.get('grade'), "section": s.get('section'),
+                   "status": a['status'], "timestamp": a['timestamp']}
+
+EXPORT_BATCH_ROWS = 256    # rows per chunk handed to the server, to avoid one write per row
+
+def iter_ndjson(rows):
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(row))
+        if len(batch) >= EXPORT_BATCH_ROWS:
+            yield "\n".join(batch) + "\n"
+            batch.clear()
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+def iter_csv(rows):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % EXPORT_BATCH_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+@app.route('/api/attendance/export', methods=['GET'])
+def api_export_attendance():
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, both optional) &format=ndjson|csv
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"status": "error", "message": "format must be ndjson or csv"}), 400
+    try:
+        start, end = date_window()
+    except ValueError:
+        return jsonify({"status": "error", "message": "from/to must be YYYY-MM-DD dates"}), 400
+
+    rows = iter_export_rows(start, end)
+    if fmt == 'csv':
+        body, mimetype = iter_csv(rows), 'text/csv'
+    else:
+        body, mimetype = iter_ndjson(rows), 'application/x-ndjson'
+    filename = f"attendance-{start or 'start'}-to-{end or 'latest'}.{fmt}"
+    return Response(body, mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+# --------------------
+# API - Who has not been marked yet, and the end-of-day auto-absent job
+# --------------------
+@app.route('/api/attendance/unmarked', methods=['GET'])
+def api_attendance_unmarked():
+    # students with no entry on ?date= (default today), optionally by grade/section;
+    # pages like /api/students (limit + cursor, fields)
+    try:
+        d = parse_date(request.args.get('date') or today_str())
+    except ValueError:
+        return jsonify({"status": "error", "message": "date must be YYYY-MM-DD"}), 400
+    try:
+        grade = int(request.args['grade']) if request.args.get('grade') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "grade must be integer"}), 400
+    try:
+        fields = parse_fields(STUDENT_FIELDS)
+        limit, after = page_args(student_key)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    section = (request.args.get('section') or '').strip() or None
+
+    ids = sorted(unmarked_ids(d, grade=grade, section=section))
+    total = len(ids)
+    if after is not None:
+        ids = ids[bisect_right(ids, after):]
+    if limit is not None:
+        ids = ids[:limit + 1]
+    found = students.get_many(ids)
+    rows = [found[i] for i in ids if i in found]
+    payload = page_payload("students", rows, limit, lambda s: s["id"], fields)
+    return jsonify({**payload, "date": d, "count": total}), 200
+
+@app.route('/api/attendance/auto-absent', methods=['POST'])
+def api_auto_absent():
+    # run the end-of-day job now for ?date= (default today), regardless of schedule
+    try:
+        d = date.fromisoformat(parse_date(request.args.get('date') or today_str()))
+    except ValueError:
+        return jsonify({"status": "error", "message": "date must be YYYY-MM-DD"}), 400
+    marked = auto_absent.run(d, force=True) if auto_absent else mark_unmarked_absent(d)
+    return jsonify({"status": "success", "date": d.isoformat(), "marked": marked}), 200
+
+# --------------------
+# API - Attendance summary from the rollup counters (no raw entries are read)
+# --------------------
+def rate(present, enrolled):
+    return round(present / enrolled, 4) if enrolled else None
+
+@app.route('/api/attendance/summary', methods=['GET'])
+def api_attendance_summary():
+    # ?grade=&section= narrow the group; the window is from/to, or the last `days`
+    # days ending at `to` (default today). Only days with any attendance count.
+    try:
+        grade = int(request.args['grade']) if request.args.get('grade') else None
+        days = int(request.args.get('days') or 7)
+    except ValueError:
+        return jsonify({"status": "error", "message": "grade and days must be integers"}), 400
+    try:
+        end = parse_date(request.args.get('to') or today_str())
+        start = parse_date(request.args['from']) if request.args.get('from') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "from/to must be YYYY-MM-DD dates"}), 400
+    if start is None:
+        start = (date.fromisoformat(end) - timedelta(days=max(days, 1) - 1)).isoformat()
+    span = (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+    if not 1 <= span <= app.config['SUMMARY_MAX_DAYS']:
+        return jsonify({"status": "error",
+                        "message": f"window must be 1 to {app.config['SUMMARY_MAX_DAYS']} days"}), 400
+    section = (request.args.get('section') or '').strip() or None
+
+    # depends on the marks in the window and on the roster (enrolled counts)
+    a_token, a_modified = attendance.range_version(start, end)
+    r_token, r_modified = students.version()
+    version = (f"{a_token}-{r_token}", max(a_modified, r_modified))
+    unchanged = not_modified(version)
+    if unchanged:
+        return unchanged
+
+    def build():
+        enrolled = students.count(grade=grade, section=section)
+        per_day, present, absent, marked = [], 0, 0, 0
+        for d, counts in rollups.counts(start, end, grade=grade, section=section):
+            day_marked = sum(counts.values())
+            per_day.append({"date": d, "present": counts.get("Present", 0), "absent": counts.get("Absent", 0),
+                            "marked": day_marked, "not_marked": max(enrolled - day_marked, 0),
+                            "rate": rate(counts.get("Present", 0), enrolled)})
+            present += counts.get("Present", 0)
+            absent += counts.get("Absent", 0)
+            marked += day_marked
+        school_days = len(per_day)
+        return {"status": "success", "from": start, "to": end, "grade": grade, "section": section,
+                "enrolled": enrolled,
+                "totals": {"school_days": school_days, "present": present, "absent": absent, "marked": marked,
+                           "not_marked": sum(d["not_marked"] for d in per_day),
+                           "rate": rate(present, enrolled * school_days)},
+                "days": per_day}
+
+    key = ("summary", start, end, grade, (section or "").lower())
+    return cached_json(key, version, ["attendance:range", "roster"], build), 200
+
+# --------------------
+# API - Per-student history, absence streaks and absence reports (bitmaps)
+# --------------------
+@app.route('/api/students/<int:student_id>/history', methods=['GET'])
+def api_student_history(student_id):
+    if not find_student(student_id):
+        return jsonify({"status": "error", "message": "Student not found"}), 404
+    try:
+        start, end = date_window()
+    except ValueError:
+        return jsonify({"status": "error", "message": "from/to must be YYYY-MM-DD dates"}), 400
+    version = attendance.range_version(start, end)
+    unchanged = not_modified(version)
+    if unchanged:
+        return unchanged
+    days = bitmaps.history(student_id, start, end)
+    counts = {k: sum(1 for _, st in days if st == v) for k, v in
+              (("present", "Present"), ("absent", "Absent"), ("not_marked", None))}
+    payload = {"status": "success", "student_id": student_id, "from": start, "to": end,
+               "school_days": len(days), **counts,
+               "days": [{"date": d, "status": st} for d, st in days]}
+    return with_validators(jsonify(payload), version), 200
+
+@app.route('/api/students/<int:student_id>/streaks', methods=['GET'])
+def api_student_streaks(student_id):
+    # consecutive school days absent (current run and longest run)
+    if not find_student(student_id):
+        return jsonify({"status": "error", "message": "Student not found"}), 404
+    try:
+        start, end = date_window()
+    except ValueError:
+        return jsonify({"status": "error", "message": "from/to must be YYYY-MM-DD dates"}), 400
+    version = attendance.range_version(start, end)
+    unchanged = not_modified(version)
+    if unchanged:
+        return unchanged
+    streaks = bitmaps.streaks(student_id, start, end)
+    return with_validators(jsonify({"status": "success", "student_id": student_id,
+                                    "from": start, "to": end, **streaks}), version), 200
+
+@app.route('/api/attendance/absences', methods=['GET'])
+def api_attendance_absences():
+    # students with more than `min` absences (default 0) in the window, optionally by grade/section
+    try:
+        more_than = int(request.args.get('min') or 0)
+        grade = int(request.args['grade']) if request.args.get('grade') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "min and grade must be integers"}), 400
+    try:
+        start, end = date_window()
+    except ValueError:
+        return jsonify({"status": "error", "message": "from/to must be YYYY-MM-DD dates"}), 400
+    section = (request.args.get('section') or '').strip() or None
+
+    a_token, a_modified = attendance.range_version(start, end)
+    r_token, r_modified = students.version()
+    version = (f"{a_token}-{r_token}", max(a_modified, r_modified))
+    unchanged = not_modified(version)
+    if unchanged:
+        return unchanged
+
+    def build():
+        ids = None
+        if grade is not None or section is not None:
+            ids = [x['id'] for x in students.query(grade=grade, section=section)]
+        counts = bitmaps.absence_counts(start, end, more_than, ids)
+        found = students.get_many([sid for sid, _, _ in counts])
+        rows = []
+        for sid, absent, present in counts:
+            s = found.get(sid)
+            if s:
+                rows.append({"student_id": sid, "name": s['name'], "grade": s['grade'],
+                             "section": s['section'], "absences": absent, "present": present})
+        return {"status": "success", "from": start, "to": end, "min": more_than, "students": rows}
+
+    key = ("absences", start, end, more_than, grade, (section or "").lower())
+    return cached_json(key, version, ["attendance:range", "roster"], build), 200
+
+# --------------------
+# Static assets: templates link the fingerprinted URLs, which never change content
+# --------------------
+assets = AssetManifest(os.path.join(app.root_path, 'static'))
+
+@app.template_global()
+def asset_url(name):
+    return url_for('static_asset', filename=assets.url_name(name))
+
+@app.route('/static/<path:filename>')
+def static_asset(filename):
+    asset, fingerprinted = assets.get(filename)
+    if asset is None:
+        abort(404)
+    if request.if_none_match.contains(asset.digest):
+        resp = Response(status=304)
+    else:
+        body, encoding = asset.encoded(lambda enc: request.accept_encodings[enc] > 0)
+        resp = Response(body, mimetype=asset.mimetype)
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+    resp.set_etag(asset.digest)
+    resp.vary.add('Accept-Encoding')
+    # plain names (no hash) may change under the same URL, so those revalidate
+    resp.headers['Cache-Control'] = IMMUTABLE if fingerprinted else 'no-cache'
+    return resp
+
+# --------------------
+# Admin Dashboard UI, Student Login UI, Attendance UI (templates/ + static/)
 # --------------------
 @app.route('/dashboard')
 def dashboard():
     # admin dashboard: manage students and view today's attendance
-    return render_template_string("""
-<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8"/>
-  <meta name="viewport" content="width=device-width,initial-scale=1"/>
-  <title>Admin Dashboard - Students & Attendance</title>
-  <style>
-    :root{--bg:#f7fbff;--card:#fff;--accent:#2b6ef6;--muted:#6b7280}
-    body{font-family:Inter, system-ui, -apple-system, 'Segoe UI', Roboto, Arial; background:var(--bg); margin:0; padding:24px}
-    .wrap{max-width:1100px;margin:0 auto}
-    header{display:flex;justify-content:space-between;align-items:center}
-    h1{margin:0}
-    .muted{color:var(--muted)}
-    .grid{display:grid;grid-template-columns:1fr 380px;gap:16px;margin-top:16px}
-    .card{background:var(--card);padding:12px;border-radius:10px;box-shadow:0 6px 18px rgba(16,24,40,0.06)}
-    table{width:100%;border-collapse:collapse}
-    th,td{padding:8px;border-bottom:1px solid #eee;text-align:left}
-    th{background:#f3f4f6}
-    input,select{padding:8px;border-radius:8px;border:1px solid #e6eef8;width:100%}
-    .row{display:flex;gap:8px;margin-top:8px}
-    button{background:var(--accent);color:white;border:none;padding:8px 10px;border-radius:8px;cursor:pointer}
-    .ghost{background:#e5e7eb;color:#111}
-    .small{padding:6px 8px;font-size:14px}
-    .attendance-list{max-height:300px;overflow:auto}
-    .footer{margin-top:12px;color:var(--muted);font-size:13px}
-    @media(max-width:900px){.grid{grid-template-columns:1fr}}
-  </style>
-</head>
-<body>
-  <div class="wrap">
-    <header>
-      <div>
-        <h1>Student Dashboard</h1>
-        <div class="muted">Manage students & view attendance (today)</div>
-      </div>
-      <div>
-        <a href="/login" style="text-decoration:none"><button class="small">Student Login</button></a>
-      </div>
-    </header>
-
-    <div class="grid">
-      <!-- left: students table -->
-      <div class="card">
-        <h3>Students</h3>
-        <div style="display:flex;gap:8px;margin-bottom:8px">
-          <input id="search" placeholder="Search name..." />
-          <button id="btnSearch" class="ghost small">Search</button>
-          <button id="btnRefresh" class="small">Refresh</button>
-        </div>
-
-        <table>
-          <thead><tr><th>ID</th><th>Name</th><th>Grade</th><th>Section</th><th>Action</th></tr></thead>
-          <tbody id="studentsTbody"></tbody>
-        </table>
-
-        <div style="margin-top:12px">
-          <h4>Add / Edit Student</h4>
-          <input type="hidden" id="editId" />
-          <div style="margin-top:8px"><input id="sname" placeholder="Full name" /></div>
-          <div class="row">
-            <input id="sgrade" type="number" placeholder="Grade" />
-            <input id="ssection" placeholder="Section" />
-          </div>
-          <div class="row" style="margin-top:8px">
-            <button id="btnSave">Save</button>
-            <button id="btnClear" class="ghost">Clear</button>
-          </div>
-        </div>
-      </div>
-
-      <!-- right: today's attendance -->
-      <div class="card">
-        <h3>Today's Attendance (<span id="today"></span>)</h3>
-        <div class="attendance-list">
-          <table style="width:100%">
-            <thead><tr><th>Student</th><th>Time</th><th>Status</th></tr></thead>
-            <tbody id="attendanceTbody"></tbody>
-          </table>
-        </div>
-
-        <div style="margin-top:12px">
-          <h4>Export / Quick Ops</h4>
-          <button id="btnExport" class="ghost small">Export JSON</button>
-          <button id="btnClearAll" class="ghost small">Clear Today (danger)</button>
-        </div>
-
-        <div class="footer">Note: Attendance is stored in-memory (server restart clears data). Use export before restart.</div>
-      </div>
-    </div>
-  </div>
-
-<script>
-const apiBase = '/api';
-
-async function fetchStudents(q='') {
-  const url = q ? apiBase + '/students?q=' + encodeURIComponent(q) : apiBase + '/students';
-  const res = await fetch(url);
-  return await res.json();
-}
-
-function renderStudents(list) {
-  const tbody = document.getElementById('studentsTbody');
-  tbody.innerHTML = '';
-  list.forEach(s => {
-    const tr = document.createElement('tr');
-    tr.innerHTML = `
-      <td>${s.id}</td>
-      <td>${s.name}</td>
-      <td>${s.grade}</td>
-      <td>${s.section}</td>
-      <td>
-        <button class="ghost small" data-id="${s.id}" data-action="edit">Edit</button>
-        <button class="ghost small" data-id="${s.id}" data-action="delete">Delete</button>
-      </td>
-    `;
-    tbody.appendChild(tr);
-  });
-}
-
-async function refreshStudents() {
-  const q = document.getElementById('search').value.trim();
-  const res = await fetchStudents(q);
-  if (res.status === 'success') renderStudents(res.students);
-}
-
-async function refreshAttendance() {
-  const today = new Date().toISOString().slice(0,10);
-  document.getElementById('today').innerText = today;
-  const res = await fetch(apiBase + '/attendance?date=' + today);
-  const data = await res.json();
-  const tbody = document.getElementById('attendanceTbody');
-  tbody.innerHTML = '';
-  if (data.status === 'success') {
-    data.attendance.forEach(a => {
-      const tr = document.createElement('tr');
-      const name = getStudentName(a.student_id) || ('#' + a.student_id);
-      const time = new Date(a.timestamp).toLocaleTimeString();
-      tr.innerHTML = `<td>${name}</td><td>${time}</td><td>${a.status}</td>`;
-      tbody.appendChild(tr);
-    });
-  }
-}
-
-function getStudentName(id) {
-  const rows = document.querySelectorAll('#studentsTbody tr');
-  for (const r of rows) {
-    if (r.querySelector('td')) {
-      const sid = parseInt(r.querySelector('td').innerText, 10);
-      if (sid === id) return r.querySelectorAll('td')[1].innerText;
-    }
-  }
-  return null;
-}
-
-// event handlers for edit/delete/save
-document.addEventListener('click', async (e) => {
-  if (e.target.matches('button[data-action]')) {
-    const id = parseInt(e.target.dataset.id, 10);
-    const action = e.target.dataset.action;
-    if (action === 'edit') {
-      // populate form
-      const res = await fetch(apiBase + '/students/' + id);
-      const data = await res.json();
-      if (data.status === 'success') {
-        document.getElementById('editId').value = data.student.id;
-        document.getElementById('sname').value = data.student.name;
-        document.getElementById('sgrade').value = data.student.grade;
-        document.getElementById('ssection').value = data.student.section;
-        window.scrollTo({top:0, behavior:'smooth'});
-      } else alert(data.message || 'Could not load student');
-    } else if (action === 'delete') {
-      if (!confirm('Delete student and their attendance?')) return;
-      const res = await fetch(apiBase + '/students/' + id, { method: 'DELETE' });
-      const data = await res.json();
-      if (data.status === 'success') { refreshStudents(); refreshAttendance(); } else alert(data.message);
-    }
-  }
-});
-
-document.getElementById('btnSave').addEventListener('click', async () => {
-  const id = document.getElementById('editId').value;
-  const name = document.getElementById('sname').value.trim();
-  const grade = document.getElementById('sgrade').value;
-  const section = document.getElementById('ssection').value.trim();
-
-  if (!name || !grade || !section) { alert('All fields required'); return; }
-
-  const payload = { name, grade: parseInt(grade,10), section };
-
-  if (id) {
-    const res = await fetch(apiBase + '/students/' + id, { method: 'PUT', headers: {'Content-Type':'application/json'}, body: JSON.stringify(payload) });
-    const data = await res.json();
-    if (data.status === 'success') { clearForm(); refreshStudents(); refreshAttendance(); } else alert(data.message);
-  } else {
-    const res = await fetch(apiBase + '/students', { method: 'POST', headers: {'Content-Type':'application/json'}, body: JSON.stringify(payload) });
-    const data = await res.json();
-    if (data.status === 'success') { clearForm(); refreshStudents(); } else alert(data.message);
-  }
-});
-
-document.getElementById('btnClear').addEventListener('click', clearForm);
-document.getElementById('btnRefresh').addEventListener('click', () => { document.getElementById('search').value=''; refreshStudents(); });
-document.getElementById('btnSearch').addEventListener('click', refreshStudents);
-document.getElementById('btnExport').addEventListener('click', async () => {
-  const today = new Date().toISOString().slice(0,10);
-  const res = await fetch(apiBase + '/attendance?date=' + today);
-  const data = await res.json();
-  if (data.status === 'success') {
-    const blob = new Blob([JSON.stringify(data.attendance, null, 2)], {type:'application/json'});
-    const url = URL.createObjectURL(blob);
-    const a = document.createElement('a'); a.href = url; a.download = 'attendance-' + today + '.json'; a.click(); URL.revokeObjectURL(url);
-  } else alert('No attendance to export');
-});
-
-document.getElementById('btnClearAll').addEventListener('click', async () => {
-  if (!confirm('Clear today\\'s attendance? This cannot be undone in-memory.')) return;
-  // call server endpoint to clear today's attendance
-  const today = new Date().toISOString().slice(0,10);
-  const res = await fetch(apiBase + '/attendance/clear?date=' + today, { method: 'POST' });
-  const data = await res.json();
-  if (data.status === 'success') refreshAttendance();
-  else alert(data.message || 'Failed');
-});
-
-function clearForm() {
-  document.getElementById('editId').value = '';
-  document.getElementById('sname').value = '';
-  document.getElementById('sgrade').value = '';
-  document.getElementById('ssection').value = '';
-}
-
-window.addEventListener('load', () => {
-  refreshStudents();
-  refreshAttendance();
-  setInterval(refreshAttendance, 30 * 1000); // update attendance list periodically
-});
-</script>
-</body>
-</html>
-    """)
+    return render_template('dashboard.html', durable=db is not None or journal is not None)
 
 # --------------------
 # Student Login Page (ID + Name)
 # --------------------
 @app.route('/login')
 def login_page():
-    return render_template_string("""
-<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8"/>
-  <meta name="viewport" content="width=device-width,initial-scale=1"/>
-  <title>Student Login</title>
-  <style>
-    body{font-family:Arial;display:flex;align-items:center;justify-content:center;height:100vh;background:#f4f6fb;margin:0}
-    .card{background:#fff;padding:20px;border-radius:10px;box-shadow:0 6px 20px rgba(16,24,40,0.08);width:360px}
-    input{width:100%;padding:10px;margin:8px 0;border-radius:8px;border:1px solid #e6eef8}
-    button{width:100%;padding:10px;background:#2563eb;color:#fff;border:none;border-radius:8px;cursor:pointer}
-    .muted{font-size:13px;color:#6b7280;text-align:center;margin-top:8px}
-    a{display:block;text-align:center;margin-top:8px;color:#2563eb;text-decoration:none}
-  </style>
-</head>
-<body>
-  <div class="card">
-    <h3 style="margin:0 0 8px 0">Student Login</h3>
-    <input id="sid" type="number" placeholder="Student ID" />
-    <input id="sname" type="text" placeholder="Full name (case-insensitive match)" />
-    <button id="btnLogin">Login</button>
-    <div class="muted">Use your ID and full name to login and mark attendance.</div>
-    <a href="/dashboard">Back to dashboard</a>
-  </div>
-
-<script>
-document.getElementById('btnLogin').addEventListener('click', async () => {
-  const id = document.getElementById('sid').value.trim();
-  const name = document.getElementById('sname').value.trim();
-  if (!id || !name) { alert('Both fields required'); return; }
-  const res = await fetch('/api/login', { method: 'POST', headers: {'Content-Type':'application/json'}, body: JSON.stringify({id, name}) });
-  const data = await res.json();
-  if (res.status === 200 && data.status === 'success') {
-    window.location.href = data.redirect;
-  } else {
-    alert(data.message || 'Login failed');
-  }
-});
-</script>
-</body>
-</html>
-    """)
+    return render_template('login.html')
 
 # --------------------
 # Attendance page for single student
@@ -496,80 +1225,7 @@ def attendance_page(student_id):
     s = find_student(student_id)
     if not s:
         return "<h3>Student not found</h3>", 404
-    return render_template_string("""
-<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8"/>
-  <meta name="viewport" content="width=device-width,initial-scale=1"/>
-  <title>Attendance - {{student.name}}</title>
-  <style>
-    body{font-family:Arial;background:#f7fbff;padding:20px}
-    .card{max-width:600px;margin:40px auto;background:#fff;padding:20px;border-radius:10px;box-shadow:0 10px 30px rgba(16,24,40,0.06)}
-    h2{margin:0 0 6px 0}
-    .muted{color:#6b7280;margin-bottom:12px}
-    button{padding:10px 14px;background:#059669;color:#fff;border:none;border-radius:8px;cursor:pointer}
-    .info{margin-top:12px;padding:8px;background:#eefbf6;border-radius:8px}
-    .danger{background:#fff1f2;color:#b91c1c;padding:8px;border-radius:8px;margin-top:10px}
-    a{display:inline-block;margin-top:10px;color:#2563eb}
-  </style>
-</head>
-<body>
-  <div class="card">
-    <h2>Welcome, {{student.name}}</h2>
-    <div class="muted">Grade {{student.grade}} • Section {{student.section}}</div>
-
-    <div>
-      <button id="btnMark">Mark Present</button>
-      <a href="/login" style="margin-left:12px">Back to login</a>
-    </div>
-
-    <div id="statusBox" class="info" style="display:none"></div>
-
-    <div style="margin-top:12px">
-      <h4>Today's attendance status</h4>
-      <div id="todayStatus" class="muted">Loading...</div>
-    </div>
-
-    <div class="danger" style="display:none" id="already">You have already marked attendance for today.</div>
-  </div>
-
-<script>
-const sid = {{student.id}};
-async function checkStatus() {
-  const today = new Date().toISOString().slice(0,10);
-  const res = await fetch('/api/attendance?student_id=' + sid + '&date=' + today);
-  const data = await res.json();
-  if (data.status === 'success' && data.attendance.length) {
-    const a = data.attendance[0];
-    document.getElementById('todayStatus').innerText = a.status + ' at ' + new Date(a.timestamp).toLocaleTimeString();
-    document.getElementById('already').style.display = 'block';
-    document.getElementById('btnMark').disabled = true;
-  } else {
-    document.getElementById('todayStatus').innerText = 'Not marked yet';
-    document.getElementById('already').style.display = 'none';
-    document.getElementById('btnMark').disabled = false;
-  }
-}
-
-document.getElementById('btnMark').addEventListener('click', async () => {
-  const res = await fetch('/api/attendance', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({student_id: sid, status: 'Present'}) });
-  const data = await res.json();
-  if (res.status === 201 && data.status === 'success') {
-    document.getElementById('statusBox').style.display = 'block';
-    document.getElementById('statusBox').innerText = 'Attendance marked: ' + data.attendance.date + ' ' + new Date(data.attendance.timestamp).toLocaleTimeString();
-    checkStatus();
-  } else {
-    alert(data.message || 'Could not mark attendance');
-    checkStatus();
-  }
-});
-
-window.addEventListener('load', checkStatus);
-</script>
-</body>
-</html>
-    """, student=s)
+    return render_template('attendance.html', student=s)
 
 # --------------------
 # Utility endpoint: clear today's attendance (admin)
@@ -577,10 +1233,7 @@ window.addEventListener('load', checkStatus);
 @app.route('/api/attendance/clear', methods=['POST'])
 def api_clear_attendance():
     d = request.args.get('date') or today_str()
-    global attendance
-    before = len(attendance)
-    attendance = [a for a in attendance if a['date'] != d]
-    cleared = before - len(attendance)
+    cleared = clear_attendance(d)
     return jsonify({"status": "success", "cleared": cleared}), 200
 
 # --------------------
@@ -593,6 +1246,66 @@ def api_attendance_post_alias():
     # forward to api_post_attendance handler logic
     return api_post_attendance()
 
+# --------------------
+# CLI: flask --app app import-students roster.csv
+# --------------------
+@app.cli.command('import-students')
+@click.argument('path', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default=None,
+              help='Defaults to the file extension (.jsonl/.ndjson -> jsonl, otherwise csv).')
+@click.option('--chunk-size', type=int, default=None, help='Rows per committed chunk.')
+def import_students_command(path, fmt, chunk_size):
+    """Stream students from a CSV or JSONL file into the configured store."""
+    if db is None and journal is None:
+        # a memory store without DATA_DIR lives and dies with this process
+        raise click.ClickException("nothing would be kept: set FLASK_STORAGE_BACKEND=sqlite "
+                                   "or FLASK_DATA_DIR before importing")
+    fmt = fmt or detect_format(path.name)
+
+    def progress(report):
+        click.echo(f"{report['rows']} rows read, {report['imported']} imported, {report['failed']} failed")
+
+    report = import_students(iter_rows(path, fmt), validate_student, add_students,
+                             chunk_size=chunk_size or app.config['IMPORT_CHUNK_SIZE'],
+                             on_progress=progress)
+    for err in report['errors']:
+        click.echo(f"row {err['row']}: {err['message']}", err=True)
+    click.echo(f"done: {report['imported']} imported, {report['failed']} failed")
+    if journal:
+        journal.close()
+
+# --------------------
+# Metrics (Prometheus text format, summed over every worker)
+# --------------------
+@app.route('/metrics')
+def metrics_endpoint():
+    if metrics is None:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# --------------------
+# Admin: hot functions over the recent profiles (X-Profile-Token required)
+# --------------------
+@app.route('/api/admin/profile', methods=['GET'])
+def api_admin_profile():
+    if profiler is None:
+        abort(404)
+    if not profiler.authorized(request.headers.get('X-Profile-Token')):
+        return jsonify({"status": "error", "message": "a valid X-Profile-Token is required"}), 403
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in PROFILE_SORTS:
+        return jsonify({"status": "error", "message": f"sort must be one of {', '.join(PROFILE_SORTS)}"}), 400
+    try:
+        window = int(request.args.get('window', 900))
+        top = int(request.args.get('top', 25))
+    except ValueError:
+        return jsonify({"status": "error", "message": "window and top must be integers"}), 400
+    if window <= 0 or not 1 <= top <= 500:
+        return jsonify({"status": "error", "message": "window must be positive and top 1-500"}), 400
+    report = profiler.top(window_seconds=window, limit=top, sort=sort,
+                          endpoint=request.args.get('endpoint') or None)
+    return jsonify({"status": "success", **report}), 200
+
 # --------------------
 # Run
 # --------------------
@@ -0,0 +1,72 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli        # optional: pip install brotli for br-encoded assets
+except ImportError:
+    brotli = None
+
+# --------------------
+# Static assets, fingerprinted and precompressed once at startup.
+#
+# Each file under static/ is served as <name>.<content hash><ext> with a
+# year-long immutable cache lifetime, so browsers only refetch it after the file
+# actually changes (which changes the URL). The gzip and brotli bodies are built
+# here, not per request.
+# --------------------
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class Asset:
+    __slots__ = ("name", "digest", "mimetype", "body", "gzipped", "brotli")
+
+    def __init__(self, name, body, compress_min_bytes):
+        self.name = name
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.body = body
+        self.gzipped = self.brotli = None
+        if len(body) >= compress_min_bytes:
+            self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.brotli = brotli.compress(body)
+
+    @property
+    def fingerprinted(self):
+        stem, ext = os.path.splitext(self.name)
+        return f"{stem}.{self.digest}{ext}"
+
+    def encoded(self, accepts):
+        # (body, content-encoding) for the best encoding the client accepts
+        if self.brotli is not None and accepts("br"):
+            return self.brotli, "br"
+        if self.gzipped is not None and accepts("gzip"):
+            return self.gzipped, "gzip"
+        return self.body, None
+
+
+class AssetManifest:
+    def __init__(self, root, compress_min_bytes=512):
+        self.root = root
+        self._by_name = {}           # plain name -> Asset
+        self._by_url = {}            # fingerprinted name -> Asset
+        for dirpath, _, files in os.walk(root):
+            for f in files:
+                path = os.path.join(dirpath, f)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                with open(path, "rb") as fh:
+                    asset = Asset(name, fh.read(), compress_min_bytes)
+                self._by_name[name] = asset
+                self._by_url[asset.fingerprinted] = asset
+
+    def url_name(self, name):
+        return self._by_name[name].fingerprinted
+
+    def get(self, name):
+        # (asset, fingerprinted?) for a request path, or (None, False)
+        asset = self._by_url.get(name)
+        if asset is not None:
+            return asset, True
+        return self._by_name.get(name), False
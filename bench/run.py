@@ -0,0 +1,341 @@
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --------------------
+# Benchmarks for the attendance hot paths.
+#
+#   python bench/run.py --students 10000 --days 60 --out before.json
+#   python bench/run.py --target gunicorn --workers 4 --out after.json
+#
+# Seeds a synthetic roster plus weekday attendance history into a fresh store,
+# then replays a morning bell: every student logs in and marks present from
+# --concurrency client threads while --pollers dashboards poll today's
+# attendance. Micro-benchmarks time the store/index calls behind the routes.
+# Everything is written as one JSON document (stdout or --out) with
+# throughput and p50/p95/p99 latency of the successful responses per route
+# (429s and other failures counted apart), so runs can be diffed across
+# commits. Runs offline: the default target is the Flask test client; the
+# gunicorn target spawns a local server on a sqlite store seeded here first.
+# --------------------
+FIRST = ["Ada", "Ben", "Chioma", "Dara", "Emeka", "Fola", "Grace", "Hassan", "Ife", "Jane",
+         "Kemi", "Lola", "Musa", "Ngozi", "Obi", "Peace", "Rita", "Seun", "Tobi", "Uche"]
+LAST = ["Adeyemi", "Bello", "Chukwu", "Danjuma", "Eze", "Fashola", "Garba", "Ibrahim",
+        "Johnson", "Okafor", "Okoro", "Sani", "Smith", "Uzo", "Yusuf"]
+SECTIONS = ["Zechariah", "Malachi", "Haggai", "Joel"]
+
+
+def percentile(sorted_values, p):
+    # nearest rank
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))]
+
+# a repeat mark is answered 409 and is still a served request
+ALSO_OK = {"POST /api/attendance": (409,)}
+
+def succeeded(route, status):
+    return 200 <= status < 400 or status in ALSO_OK.get(route, ())
+
+def ms(value):
+    return round(value, 3) if value is not None else None
+
+def summarize(samples, elapsed):
+    # samples: route -> [(seconds, status)]. Throughput and latency cover the
+    # successful responses only, so a run that sheds load does not look faster.
+    out = {}
+    for route, rows in sorted(samples.items()):
+        lat = sorted(s * 1000 for s, status in rows if succeeded(route, status))
+        out[route] = {
+            "count": len(rows),
+            "ok": len(lat),
+            "rejected": sum(1 for _, status in rows if status == 429),
+            "failed": sum(1 for _, status in rows
+                          if 400 <= status < 500 and status != 429 and not succeeded(route, status)),
+            "errors": sum(1 for _, status in rows if status >= 500 or status == 0),
+            "statuses": {str(k): v for k, v in sorted(count_by(st for _, st in rows).items())},
+            "throughput_rps": round(len(lat) / elapsed, 1) if elapsed else None,
+            "p50_ms": ms(percentile(lat, 50)),
+            "p95_ms": ms(percentile(lat, 95)),
+            "p99_ms": ms(percentile(lat, 99)),
+            "max_ms": ms(lat[-1] if lat else None),
+        }
+    return out
+
+def count_by(values):
+    counts = {}
+    for v in values:
+        counts[v] = counts.get(v, 0) + 1
+    return counts
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# --------------------
+# Seeding (in process, straight through the app's mutation helpers)
+# --------------------
+def load_app(backend, workdir):
+    # the app configures its store at import time, so the env has to be set first
+    os.environ["FLASK_STORAGE_BACKEND"] = backend
+    os.environ["FLASK_SQLITE_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ.pop("FLASK_DATA_DIR", None)
+    os.environ["FLASK_RATE_LIMIT_ENABLED"] = "false"     # every simulated student shares one address
+    os.environ["FLASK_MAX_INFLIGHT_REQUESTS"] = "0"     # measure the burst, not how fast it is shed
+    os.environ.pop("FLASK_AUTO_ABSENT_AT", None)
+    sys.path.insert(0, ROOT)
+    import app as attendance_app
+    return attendance_app
+
+def school_days(days, today):
+    d, out = today - timedelta(days=1), []
+    while len(out) < days:
+        if d.weekday() < 5:
+            out.append(d)
+        d -= timedelta(days=1)
+    return out[::-1]
+
+def seed(mod, n_students, days, rng, chunk=5000):
+    roster = []
+    for i in range(n_students):
+        roster.append({"name": f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}",
+                       "grade": 7 + i % 6, "section": SECTIONS[(i // 6) % len(SECTIONS)]})
+    for i in range(0, len(roster), chunk):
+        mod.add_students(roster[i:i + chunk])
+    roster = [{"id": s["id"], "name": s["name"]} for s in roster]
+    for d in school_days(days, date.fromisoformat(mod.today_str())):
+        stamp = datetime(d.year, d.month, d.day, 7, 45).isoformat() + "Z"
+        entries = []
+        for s in roster:
+            r = rng.random()
+            if r < 0.97:
+                entries.append({"student_id": s["id"], "status": "Present" if r < 0.9 else "Absent",
+                                "timestamp": stamp, "date": d.isoformat()})
+        for i in range(0, len(entries), chunk):
+            mod.add_attendance_many(entries[i:i + chunk])
+    return roster
+
+
+# --------------------
+# Clients: (status, seconds, etag) per request
+# --------------------
+class TestClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        t = time.perf_counter()
+        r = self.client.open(path, method=method, json=body, headers=headers or {})
+        elapsed = time.perf_counter() - t
+        return r.status_code, elapsed, r.headers.get("ETag")
+
+
+class HTTPClient:
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        t = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            self.conn.request(method, path, body=data, headers=headers)
+            r = self.conn.getresponse()
+            r.read()
+            status, etag = r.status, r.getheader("ETag")
+        except (OSError, http.client.HTTPException):
+            self.conn = None
+            status, etag = 0, None
+        return status, time.perf_counter() - t, etag
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def spawn_gunicorn(workdir, workers, threads):
+    port = free_port()
+    env = dict(os.environ, FLASK_STORAGE_BACKEND="sqlite",
+               FLASK_SQLITE_PATH=os.path.join(workdir, "bench.db"),
+               FLASK_RATE_LIMIT_ENABLED="false", FLASK_MAX_INFLIGHT_REQUESTS="0",
+               GUNICORN_THREADS=str(threads))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+         "--workers", str(workers), "--worker-class", "gthread", "--threads", str(threads),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise click.ClickException("gunicorn exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise click.ClickException("gunicorn did not start listening within 30s")
+
+
+# --------------------
+# Morning-bell scenario
+# --------------------
+def morning_bell(make_client, roster, concurrency, pollers, poll_ms):
+    samples = {}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def record(route, status, elapsed):
+        with lock:
+            samples.setdefault(route, []).append((elapsed, status))
+
+    def student(chunk):
+        c = make_client()
+        for s in chunk:
+            status, elapsed, _ = c.request("POST", "/api/login", {"id": s["id"], "name": s["name"]})
+            record("POST /api/login", status, elapsed)
+            status, elapsed, _ = c.request("POST", "/api/attendance", {"student_id": s["id"], "status": "Present"})
+            record("POST /api/attendance", status, elapsed)
+
+    def dashboard():
+        # what static/dashboard.js does: conditional reads of today's expanded attendance
+        c = make_client()
+        etag = None
+        while not done.is_set():
+            status, elapsed, new = c.request("GET", "/api/attendance?expand=student&limit=500",
+                                             headers={"If-None-Match": etag} if etag else None)
+            record("GET /api/attendance", status, elapsed)
+            etag = new or etag
+            done.wait(poll_ms / 1000)
+
+    order = list(roster)
+    random.Random(0).shuffle(order)
+    workers = [threading.Thread(target=student, args=(order[i::concurrency],)) for i in range(concurrency)]
+    polls = [threading.Thread(target=dashboard) for _ in range(pollers)]
+    start = time.perf_counter()
+    for t in polls + workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in polls:
+        t.join()
+    return {"duration_s": round(elapsed, 3), "routes": summarize(samples, elapsed)}
+
+
+# --------------------
+# Micro-benchmarks (in process)
+# --------------------
+def timed(fn, min_seconds=0.5):
+    n, total = 0, 0.0
+    while total < min_seconds:
+        t = time.perf_counter()
+        fn()
+        total += time.perf_counter() - t
+        n += 1
+    return {"calls": n, "us_per_call": round(total / n * 1e6, 2), "ops_per_s": round(n / total, 1)}
+
+def micro(mod, roster, rng):
+    today = mod.today_str()
+    start = (date.fromisoformat(today) - timedelta(days=30)).isoformat()
+    ids = [s["id"] for s in roster]
+    name = roster[len(roster) // 2]["name"]
+    cases = {
+        "students.get": lambda: mod.students.get(rng.choice(ids)),
+        "students.query(grade, section)": lambda: mod.students.query(grade=9, section="Malachi", limit=100),
+        "students.search": lambda: mod.students.search(name.split()[0][:3], limit=50),
+        "students.suggest": lambda: mod.students.suggest(name[:4], 10),
+        "attendance.for_date(today)": lambda: mod.attendance.for_date(today),
+        "attendance.for_student_and_date": lambda: mod.get_attendance_for_student_and_date(rng.choice(ids), today),
+        "rollups.counts(30 days)": lambda: mod.rollups.counts(start, today),
+        "bitmaps.streaks": lambda: mod.bitmaps.streaks(rng.choice(ids)),
+        "bitmaps.absence_counts(30 days)": lambda: mod.bitmaps.absence_counts(start, today, 3),
+        "unmarked_ids(today)": lambda: mod.unmarked_ids(today),
+    }
+    return {label: timed(fn) for label, fn in cases.items()}
+
+
+@click.command()
+@click.option("--students", "n_students", type=int, default=1000, show_default=True, help="Roster size.")
+@click.option("--days", type=int, default=40, show_default=True, help="School days of attendance history.")
+@click.option("--backend", type=click.Choice(["memory", "sqlite"]), default="memory", show_default=True)
+@click.option("--target", type=click.Choice(["client", "gunicorn"]), default="client", show_default=True,
+              help="Flask test client in process, or a spawned gunicorn (always sqlite).")
+@click.option("--workers", type=int, default=2, show_default=True, help="gunicorn workers.")
+@click.option("--threads", type=int, default=8, show_default=True, help="gunicorn threads per worker.")
+@click.option("--concurrency", type=int, default=16, show_default=True, help="Client threads in the burst.")
+@click.option("--pollers", type=int, default=4, show_default=True, help="Dashboards polling during the burst.")
+@click.option("--poll-ms", type=int, default=250, show_default=True)
+@click.option("--seed", "rng_seed", type=int, default=1, show_default=True)
+@click.option("--skip-micro", is_flag=True, help="Only run the morning-bell scenario.")
+@click.option("--out", type=click.Path(dir_okay=False, writable=True), default=None,
+              help="Write the JSON report here instead of stdout.")
+def main(n_students, days, backend, target, workers, threads, concurrency, pollers, poll_ms,
+         rng_seed, skip_micro, out):
+    if target == "gunicorn":
+        backend = "sqlite"
+    rng = random.Random(rng_seed)
+    with tempfile.TemporaryDirectory(prefix="attendance-bench-") as workdir:
+        mod = load_app(backend, workdir)
+        t = time.perf_counter()
+        roster = seed(mod, n_students, days, rng)
+        seed_seconds = time.perf_counter() - t
+        click.echo(f"seeded {len(roster)} students, {days} days in {seed_seconds:.1f}s", err=True)
+
+        report = {
+            "meta": {"commit": git_commit(), "python": platform.python_version(),
+                     "started": datetime.now().isoformat(timespec="seconds"),
+                     "target": target, "backend": backend, "students": len(roster), "days": days,
+                     "concurrency": concurrency, "pollers": pollers, "seed": rng_seed,
+                     "seed_seconds": round(seed_seconds, 3)},
+        }
+        if target == "gunicorn":
+            report["meta"].update(workers=workers, threads=threads)
+            proc, port = spawn_gunicorn(workdir, workers, threads)
+            try:
+                report["morning_bell"] = morning_bell(lambda: HTTPClient(port), roster,
+                                                      concurrency, pollers, poll_ms)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+        else:
+            report["morning_bell"] = morning_bell(lambda: TestClient(mod.app), roster,
+                                                  concurrency, pollers, poll_ms)
+        if not skip_micro:
+            report["micro"] = micro(mod, roster, rng)
+
+    text = json.dumps(report, indent=2)
+    if out:
+        with open(out, "w") as f:
+            f.write(text + "\n")
+    else:
+        click.echo(text)
+
+
+if __name__ == "__main__":
+    main()
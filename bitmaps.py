@@ -0,0 +1,209 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from feed import RESET
+
+# --------------------
+# Per-student attendance bitmaps over school days.
+#
+# A school day is any date with at least one attendance entry; bit i of every
+# plane stands for the i-th school day. Each student has three Python ints:
+# marked (any status), present and absent, so counting absences is a popcount
+# and absence streaks are runs of 1 bits.
+#
+# With the memory backend the mutation helpers keep it current through add /
+# clear_date / delete_student, the same way they keep the rollups. With sqlite
+# other workers write too, so it follows the change feed instead (the events
+# the live dashboard gets): every query first applies the events since its
+# cursor, and the direct hooks do nothing. A cursor the feed can no longer
+# resume triggers a full rebuild, so the feed's retention should cover at
+# least a day of marks.
+# --------------------
+class AttendanceBitmaps:
+    def __init__(self, attendance, feed=None):
+        self._attendance = attendance
+        self._feed = feed
+        self._lock = threading.Lock()
+        self._cursor = None
+        self._days = []              # sorted school days; index = bit position
+        self._day_counts = {}        # date -> entries on that day
+        self._marked = {}            # student_id -> int
+        self._present = {}
+        self._absent = {}
+
+    # --------------------
+    # maintenance (lock held)
+    # --------------------
+    def _catch_up(self):
+        if self._feed is None:
+            return
+        if self._cursor is None:
+            self._rebuild()
+        while True:
+            events = self._feed.read(self._cursor, 0)
+            if not events:
+                return
+            if events[0][1] == RESET:
+                self._rebuild()
+                continue
+            for _, kind, data in events:
+                self._apply(kind, data)
+            self._cursor = events[-1][0]
+
+    def _rebuild(self):
+        # cursor first: events that race with the scan are re-applied, which is a no-op
+        self._cursor = self._feed.cursor() if self._feed is not None else None
+        self._days, self._day_counts = [], {}
+        self._marked, self._present, self._absent = {}, {}, {}
+        for e in self._attendance.for_range():
+            self._add(e)
+
+    def _apply(self, kind, data):
+        if kind == "attendance.add":
+            self._add(data)
+        elif kind == "attendance.clear":
+            if data["date"] in self._day_counts:
+                self._drop_day(bisect_left(self._days, data["date"]))
+        elif kind == "attendance.delete_student":
+            self._delete_student(data["student_id"])
+
+    def _add(self, entry):
+        sid, d = entry["student_id"], entry["date"]
+        if d not in self._day_counts:
+            self._insert_day(d)
+        bit = 1 << bisect_left(self._days, d)
+        if self._marked.get(sid, 0) & bit:
+            return
+        self._day_counts[d] += 1
+        self._marked[sid] = self._marked.get(sid, 0) | bit
+        if entry["status"] == "Present":
+            self._present[sid] = self._present.get(sid, 0) | bit
+        elif entry["status"] == "Absent":
+            self._absent[sid] = self._absent.get(sid, 0) | bit
+
+    def _planes(self):
+        return (self._marked, self._present, self._absent)
+
+    def _insert_day(self, d):
+        # new school days are almost always the latest; an older one shifts later bits up
+        p = bisect_left(self._days, d)
+        self._days.insert(p, d)
+        self._day_counts[d] = 0
+        if p < len(self._days) - 1:
+            low = (1 << p) - 1
+            for plane in self._planes():
+                for sid, x in plane.items():
+                    plane[sid] = (x & low) | ((x >> p) << (p + 1))
+
+    def _drop_day(self, p):
+        del self._day_counts[self._days.pop(p)]
+        low = (1 << p) - 1
+        for plane in self._planes():
+            for sid, x in list(plane.items()):
+                x = (x & low) | ((x >> (p + 1)) << p)
+                if x:
+                    plane[sid] = x
+                else:
+                    del plane[sid]
+
+    def _delete_student(self, sid):
+        marked = self._marked.pop(sid, 0)
+        self._present.pop(sid, None)
+        self._absent.pop(sid, None)
+        # walk the student's days from the latest, so dropping a day keeps lower indexes valid
+        while marked:
+            p = marked.bit_length() - 1
+            marked ^= 1 << p
+            d = self._days[p]
+            self._day_counts[d] -= 1
+            if not self._day_counts[d]:
+                self._drop_day(p)
+
+    def _window(self, start, end):
+        lo = bisect_left(self._days, start) if start else 0
+        hi = bisect_right(self._days, end) if end else len(self._days)
+        return lo, hi, ((1 << hi) - 1) ^ ((1 << lo) - 1)
+
+    # --------------------
+    # direct maintenance (memory backend; no-ops when following a feed)
+    # --------------------
+    def rebuild(self):
+        with self._lock:
+            self._rebuild()
+
+    def add(self, entry):
+        if self._feed is None:
+            with self._lock:
+                self._add(entry)
+
+    def clear_date(self, date_str):
+        if self._feed is None:
+            with self._lock:
+                self._apply("attendance.clear", {"date": date_str})
+
+    def delete_student(self, student_id):
+        if self._feed is None:
+            with self._lock:
+                self._delete_student(student_id)
+
+    # --------------------
+    # queries
+    # --------------------
+    def history(self, student_id, start=None, end=None):
+        # [(date, "Present" / "Absent" / "Other" / None)] for every school day in range
+        with self._lock:
+            self._catch_up()
+            lo, hi, _ = self._window(start, end)
+            marked = self._marked.get(student_id, 0)
+            present = self._present.get(student_id, 0)
+            absent = self._absent.get(student_id, 0)
+            out = []
+            for i in range(lo, hi):
+                bit = 1 << i
+                if present & bit:
+                    status = "Present"
+                elif absent & bit:
+                    status = "Absent"
+                else:
+                    status = "Other" if marked & bit else None
+                out.append((self._days[i], status))
+            return out
+
+    def streaks(self, student_id, start=None, end=None):
+        # consecutive school days absent: the run ending at the last school day in
+        # range, and the longest run with its first/last dates
+        with self._lock:
+            self._catch_up()
+            lo, hi, mask = self._window(start, end)
+            n = hi - lo
+            runs = (self._absent.get(student_id, 0) & mask) >> lo
+            gaps = ~runs & ((1 << n) - 1)
+            current = n - gaps.bit_length()
+            # each x &= x >> 1 shortens every run by one; the survivors of the last
+            # non-empty step mark where the longest runs start
+            longest, last = 0, runs
+            while runs:
+                last = runs
+                runs &= runs >> 1
+                longest += 1
+            first = ((last & -last).bit_length() - 1) if longest else None
+            return {"school_days": n, "current": current, "longest": longest,
+                    "longest_from": self._days[lo + first] if longest else None,
+                    "longest_to": self._days[lo + first + longest - 1] if longest else None}
+
+    def absence_counts(self, start=None, end=None, more_than=0, student_ids=None):
+        # [(student_id, absences, presents)] with more than `more_than` absences in
+        # range, most absences first; student_ids narrows the candidates
+        with self._lock:
+            self._catch_up()
+            _, _, mask = self._window(start, end)
+            absent = self._absent
+            candidates = absent.items() if student_ids is None else (
+                (sid, absent[sid]) for sid in student_ids if sid in absent)
+            out = []
+            for sid, bits in candidates:
+                count = (bits & mask).bit_count()
+                if count > more_than:
+                    out.append((sid, count, (self._present.get(sid, 0) & mask).bit_count()))
+            out.sort(key=lambda r: (-r[1], r[0]))
+            return out
@@ -0,0 +1,111 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+# --------------------
+# Cache of encoded JSON responses for hot reads.
+#
+# Entries are keyed by (endpoint, normalized query) and carry the store version
+# they were built from plus a set of tags ("roster", "day:<date>", ...). The
+# mutation helpers invalidate exactly the tags they touch; the version check on
+# lookup also catches writes made by other processes. Size is bounded by entry
+# count and total bytes, evicting least recently used first.
+# --------------------
+class CachedBody:
+    __slots__ = ("key", "version", "body", "gzipped", "tags")
+
+    def __init__(self, key, version, body, tags):
+        self.key = key
+        self.version = version
+        self.body = body
+        self.gzipped = None
+        self.tags = tags
+
+    @property
+    def size(self):
+        return len(self.body) + len(self.gzipped or b"")
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, gzip_min_bytes=1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.gzip_min_bytes = gzip_min_bytes
+        self._entries = OrderedDict()      # key -> CachedBody, LRU order
+        self._by_tag = {}                  # tag -> set of keys
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, tags):
+        entry = CachedBody(key, version, body, frozenset(tags))
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            self._evict()
+        return entry
+
+    def gzipped(self, entry):
+        # compressed variant, built on first demand and kept with the entry
+        if entry.gzipped is None and len(entry.body) >= self.gzip_min_bytes:
+            data = gzip.compress(entry.body, compresslevel=6)
+            with self._lock:
+                if entry.gzipped is None:
+                    entry.gzipped = data
+                    if self._entries.get(entry.key) is entry:
+                        self._bytes += len(data)
+                        self._evict()
+        return entry.gzipped
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+            self._bytes = 0
+
+    # --------------------
+    # internals (lock held)
+    # --------------------
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
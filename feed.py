@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+# --------------------
+# Change feed for live dashboards (served as server-sent events).
+#
+# Every attendance mutation is published with a monotonically increasing id.
+# Cursors look like "<epoch>-<seq>": the epoch changes whenever the sequence
+# restarts (process restart for the in-memory feed), and a cursor that can no
+# longer be resumed -- wrong epoch, or older than the retained window -- gets a
+# single "reset" event telling the client to reload everything.
+# --------------------
+RESET = "reset"
+
+def parse_cursor(cursor):
+    epoch, _, seq = (cursor or "").rpartition("-")
+    try:
+        return epoch, int(seq)
+    except ValueError:
+        return None, None
+
+
+class ChangeFeed:
+    def __init__(self, capacity=10000):
+        self.epoch = format(time.time_ns(), "x")
+        self._events = deque(maxlen=capacity)    # (seq, kind, data)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def publish(self, kind, data):
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, kind, data))
+            self._cond.notify_all()
+
+    def cursor(self):
+        return f"{self.epoch}-{self._seq}"
+
+    def read(self, cursor, timeout):
+        # events after cursor as [(event id, kind, data)], waiting up to timeout
+        # seconds for the first one; [] on timeout
+        epoch, seq = parse_cursor(cursor)
+        with self._cond:
+            if epoch != self.epoch or seq > self._seq or (
+                    self._events and seq < self._events[0][0] - 1):
+                return [(self.cursor(), RESET, {})]
+            if seq == self._seq:
+                self._cond.wait_for(lambda: self._seq > seq, timeout)
+            if not self._events or seq >= self._seq:
+                return []
+            start = seq - self._events[0][0] + 1
+            if start < 0:
+                return [(self.cursor(), RESET, {})]
+            return [(f"{self.epoch}-{s}", kind, data)
+                    for s, kind, data in islice(self._events, start, None)]
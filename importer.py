@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+
+# --------------------
+# Streaming student import (CSV with a name,grade,section header, or JSONL).
+# Rows are parsed lazily and committed in fixed-size chunks, so memory stays
+# bounded by the chunk size no matter how large the upload is.
+# --------------------
+FORMATS = ("csv", "jsonl")
+MAX_REPORTED_ERRORS = 1000
+
+def detect_format(filename=None, content_type=None):
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith((".jsonl", ".ndjson")) or "ndjson" in ctype or "jsonl" in ctype:
+        return "jsonl"
+    return "csv"
+
+def iter_rows(stream, fmt):
+    # yields (row number, dict or None); None means the line could not be parsed
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for n, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield n, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+def import_students(rows, validate, commit, chunk_size=500, on_progress=None):
+    # validate(row) -> (record, error); commit(records) stores one chunk and
+    # assigns ids. Returns a report with per-row errors (capped).
+    report = {"rows": 0, "imported": 0, "failed": 0, "chunks": 0, "errors": []}
+    chunk = []
+
+    def flush():
+        commit(chunk)
+        report["imported"] += len(chunk)
+        report["chunks"] += 1
+        chunk.clear()
+        if on_progress:
+            on_progress(report)
+
+    for n, row in rows:
+        report["rows"] += 1
+        record, error = validate(row) if row is not None else (None, "could not parse row")
+        if error:
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": n, "message": error})
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    return report
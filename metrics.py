@@ -0,0 +1,279 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+try:
+    import fcntl
+except ImportError:          # not on Windows; dead workers' files are then kept as they are
+    fcntl = None
+
+# --------------------
+# Request metrics in Prometheus text format.
+#
+# Every request adds one observation: a count per (method, endpoint, status)
+# and a fixed-bucket latency histogram per (method, endpoint). That is one
+# bisect plus a few increments under a lock.
+#
+# Each gunicorn worker keeps its own numbers. With a directory configured,
+# every worker writes them to metrics-<pid>.json every few seconds (and the
+# scraped worker right before rendering), and /metrics adds up all the files.
+# The counters of workers that have exited are folded into metrics-retired.json
+# (under a file lock), so the totals never go backwards while the directory stays
+# one file per live worker, however often gunicorn recycles them. Files written
+# under a different parent process (a previous gunicorn master) are stale and get
+# removed. Gauges are reported per live worker.
+# --------------------
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+RETIRED = "metrics-retired.json"
+
+def parse_buckets(value):
+    if isinstance(value, str):
+        value = [v for v in value.split(",") if v.strip()]
+    buckets = sorted({float(v) for v in value})
+    if not buckets or buckets[0] <= 0:
+        raise ValueError("metric buckets must be positive milliseconds")
+    return tuple(buckets)
+
+def resident_memory_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024   # peak, in KiB on Linux
+    except (ImportError, OSError):
+        return None
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+def label_str(**labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+def fmt(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RequestMetrics:
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS, directory=None, flush_seconds=5,
+                 gauges=None, prefix="attendance"):
+        self.bounds = tuple(b / 1000 for b in parse_buckets(buckets_ms))
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.gauges = gauges                 # () -> {name: (help, value)}
+        self.prefix = prefix
+        self._routes = {}                    # (method, endpoint) -> [{status: n}, [bucket counts], sum]
+        self._lock = threading.Lock()
+        self._pid = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def observe(self, method, endpoint, status, seconds):
+        i = bisect_left(self.bounds, seconds)       # le semantics: first bound >= seconds
+        key = (method, endpoint)
+        with self._lock:
+            r = self._routes.get(key)
+            if r is None:
+                r = self._routes[key] = [{}, [0] * (len(self.bounds) + 1), 0.0]
+            r[0][status] = r[0].get(status, 0) + 1
+            r[1][i] += 1
+            r[2] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            routes = [[m, e, dict(st), list(b), s] for (m, e), (st, b, s) in self._routes.items()]
+        return {"pid": os.getpid(), "ppid": os.getppid(), "bounds": self.bounds,
+                "routes": routes, "gauges": self._read_gauges(), "written": time.time()}
+
+    def _read_gauges(self):
+        gauges = {}
+        if self.gauges is not None:
+            gauges.update(self.gauges())
+        rss = resident_memory_bytes()
+        if rss is not None:
+            gauges["process_resident_memory_bytes"] = ("Resident memory of the worker.", rss)
+        return gauges
+
+    # --------------------
+    # cross-worker files
+    # --------------------
+    def start(self):
+        # per process (call again after a fork): keep this worker's file fresh
+        if not self.directory or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+        atexit.register(self._final_flush)      # a recycled worker's last requests still count
+
+    def _final_flush(self):
+        if self._pid == os.getpid():
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def flush(self):
+        path = self._path(os.getpid())
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _collect(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        ppid = os.getppid()
+        out, dead, retired = [], [], None
+        for name in os.listdir(self.directory):
+            if not (name.startswith("metrics-") and name.endswith(".json")):
+                continue
+            snap = self._read(name)
+            if snap is None:
+                continue
+            if snap.get("ppid") != ppid:
+                self._remove(name)
+                continue
+            if tuple(snap["bounds"]) != self.bounds:
+                continue
+            if name == RETIRED:
+                retired = snap
+            elif snap["pid"] == os.getpid() or pid_alive(snap["pid"]):
+                out.append(snap)
+            else:
+                dead.append(name)
+        if dead and fcntl is not None:
+            retired = self._retire(dead, ppid)
+        elif dead:
+            out += [s for s in map(self._read, dead) if s is not None]
+        if retired is not None:
+            out.append(retired)
+        return out
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _retire(self, dead, ppid):
+        # add the dead workers' counters to the retired file, then drop their files.
+        # The file lists the pids it holds, so a crash between the two steps (or
+        # another worker folding the same file) never counts a worker twice.
+        with open(os.path.join(self.directory, "retire.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired = self._read(RETIRED)
+            if retired is None or retired.get("ppid") != ppid or tuple(retired["bounds"]) != self.bounds:
+                retired = {"pid": None, "ppid": ppid, "bounds": self.bounds, "routes": [],
+                           "gauges": {}, "merged": [], "retired": True}
+            routes = {(m, e): [st, b, s] for m, e, st, b, s in retired["routes"]}
+            for name in dead:
+                snap = self._read(name)
+                if snap is None or snap["pid"] in retired["merged"]:
+                    continue
+                for method, endpoint, st, buckets, total in snap["routes"]:
+                    r = routes.get((method, endpoint))
+                    if r is None:
+                        routes[(method, endpoint)] = [dict(st), list(buckets), total]
+                        continue
+                    for status, n in st.items():
+                        r[0][status] = r[0].get(status, 0) + n
+                    r[1] = [a + b for a, b in zip(r[1], buckets)]
+                    r[2] += total
+                retired["merged"].append(snap["pid"])
+            retired["routes"] = [[m, e, st, b, s] for (m, e), (st, b, s) in routes.items()]
+            self._write_retired(retired)
+            for name in dead:
+                self._remove(name)
+            # the pids only need remembering while their files are around (a pid
+            # can be reused by a later worker)
+            present = set(os.listdir(self.directory))
+            retired["merged"] = [pid for pid in retired["merged"] if f"metrics-{pid}.json" in present]
+            self._write_retired(retired)
+        return retired
+
+    def _write_retired(self, retired):
+        path = os.path.join(self.directory, RETIRED)
+        with open(path + ".tmp", "w") as f:
+            json.dump(retired, f)
+        os.replace(path + ".tmp", path)
+
+    # --------------------
+    # exposition
+    # --------------------
+    def render(self):
+        snaps = self._collect()
+        statuses, histos = {}, {}
+        for snap in snaps:
+            for method, endpoint, st, buckets, total in snap["routes"]:
+                key = (method, endpoint)
+                for status, n in st.items():
+                    k = key + (str(status),)
+                    statuses[k] = statuses.get(k, 0) + n
+                h = histos.get(key)
+                if h is None:
+                    histos[key] = [list(buckets), total]
+                else:
+                    h[0] = [a + b for a, b in zip(h[0], buckets)]
+                    h[1] += total
+
+        p = self.prefix
+        lines = [f"# HELP {p}_http_requests_total Requests by route and status code.",
+                 f"# TYPE {p}_http_requests_total counter"]
+        for (method, endpoint, status), n in sorted(statuses.items()):
+            lines.append(f"{p}_http_requests_total{{{label_str(method=method, endpoint=endpoint, status=status)}}} {n}")
+        lines += [f"# HELP {p}_http_request_duration_seconds Time to build the response, by route.",
+                  f"# TYPE {p}_http_request_duration_seconds histogram"]
+        for (method, endpoint), (buckets, total) in sorted(histos.items()):
+            labels = label_str(method=method, endpoint=endpoint)
+            running = 0
+            for bound, n in zip(self.bounds + (None,), buckets):
+                running += n
+                le = "+Inf" if bound is None else fmt(bound)
+                lines.append(f'{p}_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {running}')
+            lines.append(f"{p}_http_request_duration_seconds_sum{{{labels}}} {fmt(total)}")
+            lines.append(f"{p}_http_request_duration_seconds_count{{{labels}}} {running}")
+
+        live = [s for s in snaps if not s.get("retired") and (s["pid"] == os.getpid() or pid_alive(s["pid"]))]
+        gauges = {}
+        for snap in live:
+            for name, (help_text, value) in snap["gauges"].items():
+                gauges.setdefault(name, (help_text, []))[1].append((snap["pid"], value))
+        for name, (help_text, values) in sorted(gauges.items()):
+            metric = name if name.startswith("process_") else f"{p}_{name}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+            for pid, value in sorted(values):
+                lines.append(f'{metric}{{pid="{pid}"}} {fmt(value)}')
+        return "\n".join(lines) + "\n"
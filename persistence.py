@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:          # not on Windows; the data dir is then not locked
+    fcntl = None
+
+# --------------------
+# Durable append-only log + snapshots for the in-memory stores.
+#
+# data_dir/
+#   wal-<first seq>.log        one JSON record per line: {"seq": n, "op": ..., ...}
+#   snapshot-<seq>.jsonl       full state covering every record with a lower seq
+#
+# Startup loads the newest snapshot and replays only the records after it, so
+# recovery time follows the log tail rather than the whole history.
+# --------------------
+FSYNC_POLICIES = ("always", "interval", "never")
+
+def apply_record(students, attendance, rec):
+    # single place that turns a log record back into a store mutation
+    # (replay must be idempotent: a record can also be covered by the snapshot)
+    op = rec["op"]
+    if op == "student.add":
+        if rec["student"]["id"] not in students:
+            students.add(dict(rec["student"]))
+    elif op == "student.add_many":
+        for r in rec["students"]:
+            if r["id"] not in students:
+                students.add(dict(r))
+    elif op == "student.update":
+        students.update(rec["id"], **rec["fields"])
+    elif op == "student.delete":
+        students.delete(rec["id"])
+    elif op == "attendance.add":
+        attendance.add(dict(rec["entry"]))
+    elif op == "attendance.add_many":
+        attendance.add_many([dict(e) for e in rec["entries"]])
+    elif op == "attendance.clear":
+        attendance.clear_date(rec["date"])
+    elif op == "attendance.delete_student":
+        attendance.delete_student(rec["student_id"])
+    else:
+        raise ValueError(f"unknown journal op {op!r}")
+
+
+class Journal:
+    def __init__(self, data_dir, fsync="interval", fsync_interval_ms=50, snapshot_every=10000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.data_dir = data_dir
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.snapshot_every = snapshot_every
+        self.fresh = True              # False once any snapshot or log record was recovered
+
+        self._lock = threading.Lock()          # serializes appends / segment rotation
+        self._sync_lock = threading.Lock()     # one fsync at a time; waiters share it
+        self._seq = 0                  # seq of the next record
+        self._written = 0              # records handed to the OS
+        self._synced = 0               # records known to be on disk
+        self._since_snapshot = 0
+        self._snapshotting = False
+        self._snapshot_thread = None
+        self._file = None
+        self._stores = None
+        self._local = threading.local()        # last seq appended by this thread
+        os.makedirs(data_dir, exist_ok=True)
+        self._dir_lock = self._lock_dir()
+
+    def _lock_dir(self):
+        # one process per data dir: a second one would interleave its own seqs into
+        # the log and delete the segments and snapshots of the first
+        f = open(os.path.join(self.data_dir, "lock"), "a+")
+        if fcntl is None:
+            return f
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            raise RuntimeError(
+                f"{self.data_dir} is already in use by another process; the memory backend "
+                "with DATA_DIR needs a single worker (use the sqlite backend for several)") from None
+        return f
+
+    # --------------------
+    # recovery
+    # --------------------
+    def _files(self, prefix):
+        found = []
+        for name in os.listdir(self.data_dir):
+            if name.startswith(prefix + "-") and not name.endswith(".tmp"):
+                try:
+                    found.append((int(name[len(prefix) + 1:].split(".")[0]), name))
+                except ValueError:
+                    continue
+        return sorted(found)
+
+    def recover(self, students, attendance):
+        self._stores = (students, attendance)
+        for name in os.listdir(self.data_dir):
+            if name.startswith("snapshot-") and name.endswith(".tmp"):
+                os.remove(os.path.join(self.data_dir, name))     # snapshot cut short by a crash
+        snapshots = self._files("snapshot")
+        start = 0
+        if snapshots:
+            start, name = snapshots[-1]
+            self._load_snapshot(os.path.join(self.data_dir, name), students, attendance)
+            self.fresh = False
+        seq = start
+        segments = self._files("wal")
+        for _, name in segments:
+            for rec in self._read_segment(os.path.join(self.data_dir, name)):
+                if rec["seq"] < start:
+                    continue
+                apply_record(students, attendance, rec)
+                seq = rec["seq"] + 1
+                self._since_snapshot += 1
+                self.fresh = False
+        self._seq = self._written = self._synced = seq
+        if segments and segments[-1][0] >= start:
+            # keep appending to the newest segment rather than starting one per restart
+            self._file = open(os.path.join(self.data_dir, segments[-1][1]), "ab")
+        else:
+            self._open_segment(seq)
+        if self.fsync == "interval":
+            threading.Thread(target=self._sync_loop, name="journal-fsync", daemon=True).start()
+
+    def _read_segment(self, path):
+        with open(path, "r+b") as f:
+            good = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                yield json.loads(line)
+                good += len(line)
+            # drop a torn write at the tail so new records start on a clean line
+            f.truncate(good)
+
+    def _load_snapshot(self, path, students, attendance):
+        with open(path, "rb") as f:
+            for line in f:
+                kind, *rest = json.loads(line)
+                if kind == "student":
+                    sid, name, grade, section = rest
+                    students.add({"id": sid, "name": name, "grade": grade, "section": section})
+                elif kind == "day":
+                    d, rows = rest
+                    attendance.restore_day(d, [
+                        {"student_id": sid, "status": status, "timestamp": ts, "date": d}
+                        for sid, status, ts in rows])
+                elif kind == "meta":
+                    students.reserve_ids(rest[0]["next_student_id"])
+
+    # --------------------
+    # appends (group commit)
+    # --------------------
+    def _open_segment(self, seq):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._synced = self._written
+        path = os.path.join(self.data_dir, f"wal-{seq:012d}.log")
+        self._file = open(path, "ab")
+
+    def append(self, op, **data):
+        with self._lock:
+            rec = {"seq": self._seq, "op": op, **data}
+            self._file.write(json.dumps(rec, separators=(",", ":")).encode() + b"\n")
+            self._file.flush()
+            self._seq += 1
+            self._written = self._seq
+            self._since_snapshot += 1
+            self._local.last = self._seq
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def commit(self):
+        # make this thread's appends durable according to the fsync policy. Called
+        # after the store lock is released, so the fsync never blocks readers.
+        if self.fsync == "always":
+            self.sync(getattr(self._local, "last", 0))
+
+    def sync(self, upto=None):
+        # fsync everything written so far. Writers that arrive while another
+        # fsync is in flight wait for it and usually find their record covered.
+        upto = self._written if upto is None else upto
+        if self._synced >= upto:
+            return
+        with self._sync_lock:
+            if self._synced >= upto:
+                return
+            with self._lock:
+                target = self._written
+                f = self._file
+            try:
+                os.fsync(f.fileno())
+            except ValueError:
+                # segment was rotated (and fsynced) while we waited
+                if self._synced < upto:
+                    raise
+                return
+            self._synced = max(self._synced, target)
+
+    def _sync_loop(self):
+        event = threading.Event()
+        while not event.wait(self.fsync_interval):
+            try:
+                self.sync()
+            except (OSError, ValueError):
+                pass
+
+    # --------------------
+    # snapshots
+    # --------------------
+    def snapshot(self, background=True):
+        students, attendance = self._stores
+        # store lock before the append lock (writers hold the store write lock while
+        # appending), so no half-applied mutation can be in the capture
+        with students.lock.read(), self._lock:
+            if self._snapshotting:
+                return
+            self._snapshotting = True
+            # capture under the append lock so the snapshot lines up exactly with a seq;
+            # frozen day partitions are immutable so only open days are copied
+            seq = self._seq
+            roster = [(s["id"], s["name"], s["grade"], s["section"]) for s in students]
+            next_id = students.peek_id()
+            days = attendance.snapshot()
+            self._open_segment(seq)
+            self._since_snapshot = 0
+        if background:
+            self._snapshot_thread = threading.Thread(
+                target=self._write_snapshot, args=(seq, roster, next_id, days),
+                name="journal-snapshot", daemon=True)
+            self._snapshot_thread.start()
+        else:
+            self._write_snapshot(seq, roster, next_id, days)
+
+    def _write_snapshot(self, seq, roster, next_id, days):
+        try:
+            path = os.path.join(self.data_dir, f"snapshot-{seq:012d}.jsonl")
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(json.dumps(["meta", {"seq": seq, "next_student_id": next_id}]).encode() + b"\n")
+                for row in roster:
+                    f.write(json.dumps(["student", *row]).encode() + b"\n")
+                for d, rows in days:
+                    f.write(json.dumps(["day", d, list(rows)], separators=(",", ":")).encode() + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            self._fsync_dir()
+            # everything before this snapshot is now redundant
+            for first, name in self._files("snapshot"):
+                if first < seq:
+                    os.remove(os.path.join(self.data_dir, name))
+            for first, name in self._files("wal"):
+                if first < seq:
+                    os.remove(os.path.join(self.data_dir, name))
+        finally:
+            self._snapshotting = False
+
+    def _fsync_dir(self):
+        fd = os.open(self.data_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        # let an in-flight snapshot finish, so a clean shutdown leaves no .tmp behind
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            if self._dir_lock is not None:
+                self._dir_lock.close()       # releases the flock
+                self._dir_lock = None
@@ -0,0 +1,106 @@
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import threading
+import time
+
+# --------------------
+# Opt-in request profiling.
+#
+# A sampled fraction of requests, plus any request carrying the admin token
+# header, runs under cProfile. Each profile is dumped to its own file in a
+# shared directory:
+#
+#   <ms since epoch>-<pid>-<elapsed us>-<endpoint>.prof
+#
+# The directory only keeps the newest `keep` files. top() merges the files of
+# a recent window into one hot-function table. cProfile can only run one
+# profile at a time, so a request that arrives while another is being
+# profiled is simply not profiled. When disabled, the app does not register
+# any hooks.
+# --------------------
+SORT_KEYS = {"cumulative": 3, "tottime": 2, "calls": 1}
+
+
+class RequestProfiler:
+    def __init__(self, directory, sample_rate=0.0, token=None, keep=500):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = str(token) if token is not None else None   # env values may parse as numbers
+        self.keep = keep
+        self._busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def authorized(self, token):
+        return bool(self.token) and bool(token) and hmac.compare_digest(token, self.token)
+
+    def wants(self, token):
+        return (self.sample_rate > 0 and random.random() < self.sample_rate) or self.authorized(token)
+
+    def start(self):
+        # a running Profile, or None if another request holds the profiler
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:       # another profiling tool is active in this interpreter
+            self._busy.release()
+            return None
+        return profile
+
+    def finish(self, profile, endpoint, seconds):
+        try:
+            profile.disable()
+        finally:
+            self._busy.release()
+        name = f"{int(time.time() * 1000):013d}-{os.getpid()}-{int(seconds * 1e6)}-{endpoint}.prof"
+        path = os.path.join(self.directory, name)
+        profile.dump_stats(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._rotate()
+        return name
+
+    def _files(self):
+        return sorted(f for f in os.listdir(self.directory) if f.endswith(".prof"))
+
+    def _rotate(self):
+        files = self._files()
+        for f in files[:max(0, len(files) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.directory, f))
+            except FileNotFoundError:
+                pass         # another worker rotated it first
+
+    def top(self, window_seconds=900, limit=25, sort="cumulative", endpoint=None):
+        # hot functions over the profiles written in the last window_seconds
+        cutoff = int((time.time() - window_seconds) * 1000)
+        requests, stats = {}, None
+        for f in self._files():
+            ts, _, elapsed_us, name = f[:-len(".prof")].split("-", 3)
+            if int(ts) < cutoff or (endpoint and name != endpoint):
+                continue
+            try:
+                if stats is None:
+                    stats = pstats.Stats(os.path.join(self.directory, f))
+                else:
+                    stats.add(os.path.join(self.directory, f))
+            except (OSError, EOFError, ValueError, TypeError):
+                continue     # rotated away or half-written
+            r = requests.setdefault(name, {"endpoint": name, "profiles": 0, "seconds": 0.0})
+            r["profiles"] += 1
+            r["seconds"] += int(elapsed_us) / 1e6
+        rows = []
+        if stats is not None:
+            by = SORT_KEYS[sort]
+            for (filename, line, func), (cc, nc, tt, ct, _) in sorted(
+                    stats.stats.items(), key=lambda kv: kv[1][by], reverse=True)[:limit]:
+                rows.append({"function": func, "file": filename, "line": line, "calls": nc,
+                             "primitive_calls": cc, "tottime": round(tt, 6), "cumtime": round(ct, 6)})
+        for r in requests.values():
+            r["seconds"] = round(r["seconds"], 6)
+        return {"window_seconds": window_seconds, "sort": sort,
+                "requests": sorted(requests.values(), key=lambda r: -r["seconds"]),
+                "functions": rows}
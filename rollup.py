@@ -0,0 +1,91 @@
+from bisect import bisect_left, bisect_right, insort
+
+from store import RWLock, reads, writes
+
+# --------------------
+# Attendance rollups: per day, per (grade, section) counts of each status.
+#
+# The mutation helpers keep these in step with every mark, clear, student move
+# and delete at O(1) per entry, so summaries read a handful of counters per day
+# instead of the raw entries. Counts follow the student's current grade/section.
+# --------------------
+def group_key(student):
+    return student.get("grade"), (student.get("section") or "").lower()
+
+
+class AttendanceRollups:
+    def __init__(self, lock=None):
+        self.lock = lock or RWLock()
+        self._days = {}          # date -> {(grade, section key): {status: count}}
+        self._day_keys = []      # sorted dates, for range walks
+
+    @writes
+    def rebuild(self, students, attendance):
+        # recount from the stores (startup, after the journal has been replayed)
+        self._days.clear()
+        self._day_keys.clear()
+        for e in attendance.for_range():
+            s = students.get(e["student_id"])
+            if s is not None:
+                self.add(e, s)
+
+    @writes
+    def add(self, entry, student):
+        d = entry["date"]
+        groups = self._days.get(d)
+        if groups is None:
+            groups = self._days[d] = {}
+            insort(self._day_keys, d)
+        counts = groups.setdefault(group_key(student), {})
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+
+    @writes
+    def remove(self, entry, student):
+        d = entry["date"]
+        groups = self._days.get(d, {})
+        key = group_key(student)
+        counts = groups.get(key)
+        if not counts or entry["status"] not in counts:
+            return
+        counts[entry["status"]] -= 1
+        if not counts[entry["status"]]:
+            del counts[entry["status"]]
+            if not counts:
+                del groups[key]
+                if not groups:
+                    self.clear_date(d)
+
+    @writes
+    def move(self, entries, old, new):
+        # a student changed grade/section: carry their marks to the new group
+        if group_key(old) == group_key(new):
+            return
+        for e in entries:
+            self.remove(e, old)
+            self.add(e, new)
+
+    @writes
+    def clear_date(self, date_str):
+        if self._days.pop(date_str, None) is not None:
+            del self._day_keys[bisect_left(self._day_keys, date_str)]
+
+    @reads
+    def counts(self, start=None, end=None, grade=None, section=None):
+        # [(date, {status: count})] for each day in range that has any attendance,
+        # summed over the groups matching grade/section (None = any)
+        section = section.lower() if section is not None else None
+        lo = bisect_left(self._day_keys, start) if start else 0
+        hi = bisect_right(self._day_keys, end) if end else len(self._day_keys)
+        out = []
+        for d in self._day_keys[lo:hi]:
+            groups = self._days[d]
+            if grade is not None and section is not None:
+                merged = dict(groups.get((grade, section), {}))
+            else:
+                merged = {}
+                for (g, sec), counts in groups.items():
+                    if (grade is None or g == grade) and (section is None or sec == section):
+                        for status, n in counts.items():
+                            merged[status] = merged.get(status, 0) + n
+            out.append((d, merged))
+        return out
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:          # not on Windows; jobs are then only once per process
+    fcntl = None
+
+# --------------------
+# Once-a-day background job, safe to start in every gunicorn worker.
+#
+# Each worker runs a small polling thread. Once the wall clock passes the cutoff
+# on a scheduled weekday, the job runs under an exclusive file lock that also
+# records the last date it ran. Only the first worker to get the lock runs it for
+# that date; the rest see the date and skip. Without a lock path the claim is
+# per process only (memory backend: every worker has its own store anyway).
+# --------------------
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+def parse_weekdays(value):
+    days = {d.strip().lower()[:3] for d in value.split(",") if d.strip()}
+    if not days or not days <= set(WEEKDAYS):
+        raise ValueError(f"weekdays must be a comma-separated list of {', '.join(WEEKDAYS)}")
+    return {WEEKDAYS.index(d) for d in days}
+
+
+class DailyJob:
+    def __init__(self, at, job, weekdays="mon,tue,wed,thu,fri", lock_path=None,
+                 poll_seconds=30, logger=None, name="daily-job"):
+        self.at = datetime.strptime(at, "%H:%M").time()
+        self.job = job
+        self.weekdays = parse_weekdays(weekdays)
+        self.lock_path = lock_path
+        self.poll_seconds = poll_seconds
+        self.logger = logger
+        self.name = name
+        self._done = None            # last date this process ran or skipped the job
+        self._pid = None
+        self._mutex = threading.Lock()
+
+    def start(self):
+        # idempotent per process; call again after a fork to restart the thread
+        if self._pid == os.getpid():
+            return
+        with self._mutex:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._loop, name=self.name, daemon=True).start()
+
+    def _loop(self):
+        while True:
+            now = datetime.now()
+            if now.time() >= self.at and self._done != now.date():
+                try:
+                    self.run(now.date())
+                    self._done = now.date()
+                except Exception:
+                    # retried on the next poll
+                    if self.logger:
+                        self.logger.exception("%s failed for %s", self.name, now.date())
+            time.sleep(self.poll_seconds)
+
+    def run(self, day, force=False):
+        # run the job for `day` unless it is not a scheduled weekday or another
+        # worker already ran it; returns the job's result, or None if skipped
+        if not force and day.weekday() not in self.weekdays:
+            return None
+        with self._claim(day, force) as claimed:
+            return self.job(day) if claimed else None
+
+    @contextmanager
+    def _claim(self, day, force):
+        if self.lock_path is None or fcntl is None:
+            yield True
+            return
+        with open(self.lock_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                if not force and f.read().strip() == day.isoformat():
+                    yield False
+                    return
+                yield True
+                # only recorded once the job succeeded
+                f.seek(0)
+                f.truncate()
+                f.write(day.isoformat())
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,75 @@
+import heapq
+from collections import defaultdict
+
+# --------------------
+# Case-insensitive name search for the in-memory roster.
+#
+# Every lowercase name is split into trigrams with a posting set per trigram, so
+# a substring query of 3+ characters only looks at the students sharing all of
+# its trigrams (smallest posting set first) instead of every name. Shorter
+# queries match too many names for postings to help and scan the lowercase names.
+# --------------------
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def match_rank(name, q):
+    # lower is better: whole name, name prefix, word prefix, anywhere else
+    if name == q:
+        return 0
+    if name.startswith(q):
+        return 1
+    if " " + q in name:
+        return 2
+    return 3
+
+
+class NameIndex:
+    def __init__(self):
+        self._names = {}                  # id -> lowercase name
+        self._postings = defaultdict(set)  # trigram -> ids
+
+    def add(self, sid, name):
+        name = name.lower()
+        self._names[sid] = name
+        for g in trigrams(name):
+            self._postings[g].add(sid)
+
+    def remove(self, sid):
+        name = self._names.pop(sid, None)
+        if name is None:
+            return
+        for g in trigrams(name):
+            ids = self._postings.get(g)
+            if ids is not None:
+                ids.discard(sid)
+                if not ids:
+                    del self._postings[g]
+
+    def match(self, q):
+        # ids whose name contains q (unordered)
+        q = q.lower()
+        if len(q) < 3:
+            return {sid for sid, name in self._names.items() if q in name}
+        postings = []
+        for g in trigrams(q):
+            ids = self._postings.get(g)
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        found = set(postings[0])
+        for ids in postings[1:]:
+            found &= ids
+            if not found:
+                return found
+        if len(q) > 3:
+            # sharing every trigram does not imply the trigrams are adjacent
+            found = {sid for sid in found if q in self._names[sid]}
+        return found
+
+    def suggest(self, q, limit):
+        # best `limit` matches by match_rank, then name, then id
+        q = q.lower()
+        names = self._names
+        return heapq.nsmallest(limit, self.match(q),
+                               key=lambda sid: (match_rank(names[sid], q), names[sid], sid))
@@ -0,0 +1,616 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from feed import RESET, parse_cursor
+from store import login_name
+
+# --------------------
+# SQLite (WAL) storage backend.
+#
+# Same interface as store.StudentStore / store.AttendanceStore, but the data lives
+# in one database file shared by every gunicorn worker. Each worker thread keeps
+# its own connection; sqlite3 caches the prepared statements per connection, so the
+# SQL below is kept as constant strings.
+# --------------------
+NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL,
+    grade       INTEGER NOT NULL,
+    section     TEXT NOT NULL,
+    section_key TEXT NOT NULL,
+    name_key    TEXT             -- store.login_name(name), for the login check
+);
+CREATE INDEX IF NOT EXISTS students_grade_section ON students (grade, section_key);
+CREATE INDEX IF NOT EXISTS students_section ON students (section_key);
+CREATE TABLE IF NOT EXISTS attendance (
+    student_id INTEGER NOT NULL,
+    date       TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    timestamp  TEXT NOT NULL,
+    UNIQUE (student_id, date)
+);
+DROP INDEX IF EXISTS attendance_date;
+CREATE INDEX IF NOT EXISTS attendance_date_student ON attendance (date, student_id);
+CREATE TABLE IF NOT EXISTS events (
+    id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('next_student_id', 1);
+
+-- change versions for conditional GETs: 'roster' and 'day:<date>' scopes, all
+-- drawn from one counter so a version is never reused
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS versions (
+    scope    TEXT PRIMARY KEY,
+    version  INTEGER NOT NULL,
+    modified REAL NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS students_ins AFTER INSERT ON students BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    INSERT OR REPLACE INTO versions VALUES ('roster', (SELECT value FROM meta WHERE key = 'version'), {now});
+END;
+CREATE TRIGGER IF NOT EXISTS students_upd AFTER UPDATE ON students BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    INSERT OR REPLACE INTO versions VALUES ('roster', (SELECT value FROM meta WHERE key = 'version'), {now});
+END;
+CREATE TRIGGER IF NOT EXISTS students_del AFTER DELETE ON students BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    INSERT OR REPLACE INTO versions VALUES ('roster', (SELECT value FROM meta WHERE key = 'version'), {now});
+END;
+-- marks are written with INSERT OR IGNORE, and a trigger inherits the outer conflict
+-- policy, so the day versions are upserts (an OR REPLACE would turn into OR IGNORE)
+DROP TRIGGER IF EXISTS attendance_ins;
+DROP TRIGGER IF EXISTS attendance_del;
+CREATE TRIGGER IF NOT EXISTS attendance_version_ins AFTER INSERT ON attendance BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    INSERT INTO versions VALUES ('day:' || NEW.date, (SELECT value FROM meta WHERE key = 'version'), {now})
+        ON CONFLICT (scope) DO UPDATE SET version = excluded.version, modified = excluded.modified;
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_version_del AFTER DELETE ON attendance BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    INSERT INTO versions VALUES ('day:' || OLD.date, (SELECT value FROM meta WHERE key = 'version'), {now})
+        ON CONFLICT (scope) DO UPDATE SET version = excluded.version, modified = excluded.modified;
+END;
+""".replace("{now}", NOW)
+
+STUDENT_COLS = "id, name, grade, section"
+ATTENDANCE_COLS = "student_id, status, timestamp, date"
+MAX_DATE = "9999-12-31"
+
+# name search: an FTS5 trigram index kept in step with students by triggers. Needs
+# SQLite 3.34+ with FTS5; without it searches fall back to scanning names.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+    name, content = 'students', content_rowid = 'id', tokenize = 'trigram');
+CREATE TRIGGER IF NOT EXISTS students_fts_ins AFTER INSERT ON students BEGIN
+    INSERT INTO students_fts (rowid, name) VALUES (NEW.id, NEW.name);
+END;
+CREATE TRIGGER IF NOT EXISTS students_fts_del AFTER DELETE ON students BEGIN
+    INSERT INTO students_fts (students_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+END;
+CREATE TRIGGER IF NOT EXISTS students_fts_upd AFTER UPDATE OF name ON students BEGIN
+    INSERT INTO students_fts (students_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+    INSERT INTO students_fts (rowid, name) VALUES (NEW.id, NEW.name);
+END;
+"""
+# attendance rollups: per day, per (grade, section) status counts, kept by triggers.
+# A student's marks follow them when they change grade/section; students are
+# deleted before their attendance, so their counts leave with the student row.
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance_rollup (
+    date        TEXT NOT NULL,
+    grade       INTEGER NOT NULL,
+    section_key TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    count       INTEGER NOT NULL,
+    PRIMARY KEY (date, grade, section_key, status)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS rollup_ins AFTER INSERT ON attendance BEGIN
+    INSERT INTO attendance_rollup
+        SELECT NEW.date, grade, section_key, NEW.status, 1 FROM students WHERE id = NEW.student_id
+        ON CONFLICT DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_del AFTER DELETE ON attendance BEGIN
+    UPDATE attendance_rollup SET count = count - 1
+        WHERE date = OLD.date AND status = OLD.status
+        AND (grade, section_key) = (SELECT grade, section_key FROM students WHERE id = OLD.student_id);
+    DELETE FROM attendance_rollup WHERE date = OLD.date AND count <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_student_move AFTER UPDATE OF grade, section_key ON students
+WHEN OLD.grade != NEW.grade OR OLD.section_key != NEW.section_key BEGIN
+    UPDATE attendance_rollup SET count = count - 1
+        WHERE grade = OLD.grade AND section_key = OLD.section_key
+        AND (date, status) IN (SELECT date, status FROM attendance WHERE student_id = OLD.id);
+    DELETE FROM attendance_rollup WHERE count <= 0
+        AND date IN (SELECT date FROM attendance WHERE student_id = OLD.id);
+    INSERT INTO attendance_rollup
+        SELECT date, NEW.grade, NEW.section_key, status, 1 FROM attendance WHERE student_id = NEW.id
+        ON CONFLICT DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_student_del AFTER DELETE ON students BEGIN
+    UPDATE attendance_rollup SET count = count - 1
+        WHERE grade = OLD.grade AND section_key = OLD.section_key
+        AND (date, status) IN (SELECT date, status FROM attendance WHERE student_id = OLD.id);
+    DELETE FROM attendance_rollup WHERE count <= 0
+        AND date IN (SELECT date FROM attendance WHERE student_id = OLD.id);
+END;
+"""
+# row and day counts in meta, so sizing the table (the /metrics gauges) is one
+# lookup instead of a COUNT(*) / SELECT DISTINCT scan
+COUNT_SCHEMA = """
+CREATE TRIGGER IF NOT EXISTS attendance_count_ins AFTER INSERT ON attendance BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'attendance_rows';
+    UPDATE meta SET value = value + 1 WHERE key = 'attendance_days'
+        AND NOT EXISTS (SELECT 1 FROM attendance WHERE date = NEW.date AND rowid != NEW.rowid);
+END;
+CREATE TRIGGER IF NOT EXISTS attendance_count_del AFTER DELETE ON attendance BEGIN
+    UPDATE meta SET value = value - 1 WHERE key = 'attendance_rows';
+    UPDATE meta SET value = value - 1 WHERE key = 'attendance_days'
+        AND NOT EXISTS (SELECT 1 FROM attendance WHERE date = OLD.date);
+END;
+"""
+COUNT_REBUILD = (
+    "INSERT OR REPLACE INTO meta (key, value) VALUES ('attendance_rows', (SELECT COUNT(*) FROM attendance))",
+    "INSERT OR REPLACE INTO meta (key, value) VALUES "
+    "('attendance_days', (SELECT COUNT(DISTINCT date) FROM attendance))",
+)
+ROLLUP_REBUILD = (
+    "DELETE FROM attendance_rollup",
+    """INSERT INTO attendance_rollup
+        SELECT a.date, s.grade, s.section_key, a.status, COUNT(*)
+        FROM attendance a JOIN students s ON s.id = a.student_id
+        GROUP BY a.date, s.grade, s.section_key, a.status""",
+)
+ROLLUP_COUNTS = """
+SELECT date, status, SUM(CASE WHEN (:grade IS NULL OR grade = :grade)
+                               AND (:section IS NULL OR section_key = :section) THEN count ELSE 0 END)
+FROM attendance_rollup WHERE date >= :start AND date <= :end
+GROUP BY date, status ORDER BY date
+"""
+
+# trigrams need 3+ characters; shorter queries (or no FTS5) scan lower(name)
+NAME_MATCH = "id IN (SELECT rowid FROM students_fts WHERE students_fts MATCH :match)"
+NAME_SCAN = "instr(lower(name), :q) > 0"
+SEARCH_SQL = (f"SELECT {STUDENT_COLS} FROM students WHERE {{}} "
+              "AND (:grade IS NULL OR grade = :grade) AND (:section IS NULL OR section_key = :section) "
+              "AND id > :after ORDER BY id LIMIT :limit")
+SUGGEST_SQL = (f"SELECT {STUDENT_COLS} FROM students WHERE {{}} ORDER BY "
+               "CASE WHEN lower(name) = :q THEN 0 WHEN instr(lower(name), :q) = 1 THEN 1 "
+               "WHEN instr(lower(name), ' ' || :q) > 0 THEN 2 ELSE 3 END, lower(name), id LIMIT :limit")
+SEARCH_FTS, SEARCH_SCAN = SEARCH_SQL.format(NAME_MATCH), SEARCH_SQL.format(NAME_SCAN)
+SUGGEST_FTS, SUGGEST_SCAN = SUGGEST_SQL.format(NAME_MATCH), SUGGEST_SQL.format(NAME_SCAN)
+
+def _student(row):
+    return {"id": row[0], "name": row[1], "grade": row[2], "section": row[3]}
+
+def _entry(row):
+    return {"student_id": row[0], "status": row[1], "timestamp": row[2], "date": row[3]}
+
+
+class SQLiteDatabase:
+    def __init__(self, path, busy_timeout_ms=5000):
+        self.path = path
+        self.busy_timeout = busy_timeout_ms / 1000.0
+        self._local = threading.local()
+        conn = self.conn()
+        self.fresh = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students'").fetchone() is None
+        conn.executescript(SCHEMA)
+        self._init_name_keys(conn)
+        self.fts = self._init_search(conn)
+        self._init_rollups(conn)
+        self._init_counts(conn)
+
+    def _init_name_keys(self, conn):
+        if self._has_name_key(conn):
+            return
+        # databases from before the column: add it and normalize the existing names.
+        # Checked again under the write lock, since other workers may be doing the same.
+        with self.transaction() as conn:
+            if self._has_name_key(conn):
+                return
+            conn.execute("ALTER TABLE students ADD COLUMN name_key TEXT")
+            rows = conn.execute("SELECT id, name FROM students").fetchall()
+            conn.executemany("UPDATE students SET name_key = ? WHERE id = ?",
+                             [(login_name(name), sid) for sid, name in rows])
+
+    def _has_name_key(self, conn):
+        return any(r[1] == "name_key" for r in conn.execute("PRAGMA table_info(students)"))
+
+    def _init_search(self, conn):
+        missing = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'students_fts'").fetchone() is None
+        try:
+            conn.executescript(SEARCH_SCHEMA)
+        except sqlite3.OperationalError:
+            return False
+        if missing:
+            # index the students that predate the search table
+            conn.execute("INSERT INTO students_fts (students_fts) VALUES ('rebuild')")
+        return True
+
+    def _init_rollups(self, conn):
+        missing = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'attendance_rollup'").fetchone() is None
+        conn.executescript(ROLLUP_SCHEMA)
+        if missing:
+            # count the attendance that predates the rollup table
+            with self.transaction() as conn:
+                for sql in ROLLUP_REBUILD:
+                    conn.execute(sql)
+
+    def _init_counts(self, conn):
+        conn.executescript(COUNT_SCHEMA)
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'attendance_days'").fetchone() is None:
+            # count the attendance that predates the counters (under the write lock,
+            # so no insert slips between the count and the triggers taking over)
+            with self.transaction() as conn:
+                if conn.execute("SELECT 1 FROM meta WHERE key = 'attendance_days'").fetchone() is None:
+                    for sql in COUNT_REBUILD:
+                        conn.execute(sql)
+
+    def conn(self):
+        # one connection per thread, re-opened after a fork (gunicorn --preload)
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    @contextmanager
+    def transaction(self):
+        # re-entrant: nested blocks join the outermost transaction
+        conn = self.conn()
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            self._local.depth = depth + 1
+            try:
+                yield conn
+            finally:
+                self._local.depth = depth
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    # same shape as store.RWLock, so the app can make multi-step writes atomic
+    # without caring which backend it runs on
+    def read(self):
+        return nullcontext()
+
+    def write(self):
+        return self.transaction()
+
+
+def _version(conn, scope):
+    row = conn.execute("SELECT version, modified FROM versions WHERE scope = ?", (scope,)).fetchone()
+    return (f"db.{row[0]}", row[1]) if row else ("db.0", 0.0)
+
+
+class SQLiteStudentStore:
+    def __init__(self, db):
+        self.db = db
+        self.lock = db
+
+    def __len__(self):
+        return self.db.conn().execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+    def version(self):
+        return _version(self.db.conn(), "roster")
+
+    def __iter__(self):
+        rows = self.db.conn().execute(f"SELECT {STUDENT_COLS} FROM students ORDER BY id").fetchall()
+        return map(_student, rows)
+
+    def __contains__(self, student_id):
+        return self.db.conn().execute(
+            "SELECT 1 FROM students WHERE id = ?", (student_id,)).fetchone() is not None
+
+    def get(self, student_id):
+        row = self.db.conn().execute(
+            f"SELECT {STUDENT_COLS} FROM students WHERE id = ?", (student_id,)).fetchone()
+        return _student(row) if row else None
+
+    def get_many(self, student_ids):
+        # one query for the whole batch (ids passed as a JSON array)
+        cur = self.db.conn().execute(
+            f"SELECT {STUDENT_COLS} FROM students WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(student_ids)),))
+        return {r[0]: _student(r) for r in cur}
+
+    def login_lookup(self, student_id):
+        row = self.db.conn().execute(
+            f"SELECT {STUDENT_COLS}, name_key FROM students WHERE id = ?", (student_id,)).fetchone()
+        return (_student(row), row[4]) if row else (None, None)
+
+    def allocate_id(self):
+        with self.db.transaction() as conn:
+            sid = conn.execute("SELECT value FROM meta WHERE key = 'next_student_id'").fetchone()[0]
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'next_student_id'", (sid + 1,))
+        return sid
+
+    def allocate_ids(self, count):
+        with self.db.transaction() as conn:
+            first = conn.execute("SELECT value FROM meta WHERE key = 'next_student_id'").fetchone()[0]
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'next_student_id'", (first + count,))
+        return first
+
+    def peek_id(self):
+        return self.db.conn().execute("SELECT value FROM meta WHERE key = 'next_student_id'").fetchone()[0]
+
+    def reserve_ids(self, next_id):
+        self.db.conn().execute(
+            "UPDATE meta SET value = MAX(value, ?) WHERE key = 'next_student_id'", (next_id,))
+
+    def add(self, record):
+        with self.db.transaction() as conn:
+            if record.get("id") is None:
+                record["id"] = conn.execute(
+                    "SELECT value FROM meta WHERE key = 'next_student_id'").fetchone()[0]
+            try:
+                conn.execute("INSERT INTO students (id, name, grade, section, section_key, name_key) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (record["id"], record["name"], record["grade"], record["section"],
+                              (record["section"] or "").lower(), login_name(record["name"])))
+            except sqlite3.IntegrityError:
+                raise KeyError(f"duplicate student id {record['id']}") from None
+            conn.execute("UPDATE meta SET value = MAX(value, ?) WHERE key = 'next_student_id'",
+                         (record["id"] + 1,))
+        return record
+
+    def add_many(self, records):
+        with self.db.transaction():
+            for r in records:
+                self.add(r)
+        return records
+
+    def update(self, student_id, **fields):
+        with self.db.transaction() as conn:
+            s = self.get(student_id)
+            if s is None:
+                return None
+            s.update(fields)
+            conn.execute(
+                "UPDATE students SET name = ?, grade = ?, section = ?, section_key = ?, name_key = ? WHERE id = ?",
+                (s["name"], s["grade"], s["section"], (s["section"] or "").lower(),
+                 login_name(s["name"]), student_id))
+        return s
+
+    def delete(self, student_id):
+        with self.db.transaction() as conn:
+            s = self.get(student_id)
+            if s is not None:
+                conn.execute("DELETE FROM students WHERE id = ?", (student_id,))
+        return s
+
+    def count(self, grade=None, section=None):
+        return self.db.conn().execute(
+            "SELECT COUNT(*) FROM students WHERE (:grade IS NULL OR grade = :grade) "
+            "AND (:section IS NULL OR section_key = :section)",
+            {"grade": grade, "section": section.lower() if section is not None else None}).fetchone()[0]
+
+    def ids(self, grade=None, section=None):
+        return {r[0] for r in self.db.conn().execute(
+            "SELECT id FROM students WHERE (:grade IS NULL OR grade = :grade) "
+            "AND (:section IS NULL OR section_key = :section)",
+            {"grade": grade, "section": section.lower() if section is not None else None})}
+
+    def query(self, grade=None, section=None, after=None, limit=None):
+        conn = self.db.conn()
+        page = (-1 if after is None else after, -1 if limit is None else limit)
+        if grade is not None and section is not None:
+            cur = conn.execute(f"SELECT {STUDENT_COLS} FROM students WHERE grade = ? AND section_key = ? "
+                               "AND id > ? ORDER BY id LIMIT ?", (grade, section.lower(), *page))
+        elif grade is not None:
+            cur = conn.execute(f"SELECT {STUDENT_COLS} FROM students WHERE grade = ? AND id > ? ORDER BY id LIMIT ?",
+                               (grade, *page))
+        elif section is not None:
+            cur = conn.execute(f"SELECT {STUDENT_COLS} FROM students WHERE section_key = ? AND id > ? ORDER BY id LIMIT ?",
+                               (section.lower(), *page))
+        else:
+            cur = conn.execute(f"SELECT {STUDENT_COLS} FROM students WHERE id > ? ORDER BY id LIMIT ?", page)
+        return [_student(r) for r in cur]
+
+    def _name_query(self, fts_sql, scan_sql, q, **params):
+        q = q.lower()
+        if self.db.fts and len(q) >= 3:
+            sql, params["match"] = fts_sql, '"' + q.replace('"', '""') + '"'
+        else:
+            sql = scan_sql
+        return [_student(r) for r in self.db.conn().execute(sql, {"q": q, **params})]
+
+    def search(self, q, grade=None, section=None, after=None, limit=None):
+        return self._name_query(SEARCH_FTS, SEARCH_SCAN, q, grade=grade,
+                                section=section.lower() if section is not None else None,
+                                after=-1 if after is None else after, limit=-1 if limit is None else limit)
+
+    def suggest(self, q, limit=10):
+        return self._name_query(SUGGEST_FTS, SUGGEST_SCAN, q, limit=limit)
+
+
+class SQLiteAttendanceStore:
+    def __init__(self, db):
+        self.db = db
+        self.lock = db
+
+    def __len__(self):
+        return self.db.conn().execute("SELECT value FROM meta WHERE key = 'attendance_rows'").fetchone()[0]
+
+    def day_count(self):
+        return self.db.conn().execute("SELECT value FROM meta WHERE key = 'attendance_days'").fetchone()[0]
+
+    def day_version(self, date_str):
+        return _version(self.db.conn(), "day:" + date_str)
+
+    def range_version(self, start=None, end=None):
+        row = self.db.conn().execute(
+            "SELECT version, modified FROM versions WHERE scope >= ? AND scope <= ? ORDER BY version DESC LIMIT 1",
+            ("day:" + (start or ""), "day:" + (end or MAX_DATE))).fetchone()
+        return (f"db.{row[0]}", row[1]) if row else ("db.0", 0.0)
+
+    def days(self):
+        return [r[0] for r in self.db.conn().execute("SELECT DISTINCT date FROM attendance ORDER BY date")]
+
+    def get(self, student_id, date_str):
+        row = self.db.conn().execute(
+            f"SELECT {ATTENDANCE_COLS} FROM attendance WHERE student_id = ? AND date = ?",
+            (student_id, date_str)).fetchone()
+        return _entry(row) if row else None
+
+    def add(self, entry):
+        # the UNIQUE (student_id, date) constraint makes the duplicate check atomic across workers
+        cur = self.db.conn().execute(
+            "INSERT OR IGNORE INTO attendance (student_id, date, status, timestamp) VALUES (?, ?, ?, ?)",
+            (entry["student_id"], entry["date"], entry["status"], entry["timestamp"]))
+        return cur.rowcount == 1
+
+    def add_many(self, entries):
+        # one IMMEDIATE transaction for the batch; rowcount tells created from duplicate
+        with self.db.transaction() as conn:
+            return [conn.execute(
+                "INSERT OR IGNORE INTO attendance (student_id, date, status, timestamp) VALUES (?, ?, ?, ?)",
+                (e["student_id"], e["date"], e["status"], e["timestamp"])).rowcount == 1
+                for e in entries]
+
+    def marked_ids(self, date_str):
+        return {r[0] for r in self.db.conn().execute(
+            "SELECT student_id FROM attendance WHERE date = ?", (date_str,))}
+
+    def for_date(self, date_str):
+        cur = self.db.conn().execute(
+            f"SELECT {ATTENDANCE_COLS} FROM attendance WHERE date = ? ORDER BY rowid", (date_str,))
+        return [_entry(r) for r in cur]
+
+    def for_range(self, start=None, end=None):
+        cur = self.db.conn().execute(
+            f"SELECT {ATTENDANCE_COLS} FROM attendance WHERE date >= ? AND date <= ? ORDER BY date, rowid",
+            (start or "", end or MAX_DATE))
+        for row in cur:
+            yield _entry(row)
+
+    def page(self, start=None, end=None, after=None, limit=None):
+        # keyset paging over the (date, student_id) index
+        cur = self.db.conn().execute(
+            f"SELECT {ATTENDANCE_COLS} FROM attendance WHERE date >= ? AND date <= ? "
+            "AND (date, student_id) > (?, ?) ORDER BY date, student_id LIMIT ?",
+            (start or "", end or MAX_DATE, *(after or ("", -1)), -1 if limit is None else limit))
+        return [_entry(r) for r in cur]
+
+    def student_dates(self, student_id, start=None, end=None):
+        cur = self.db.conn().execute(
+            "SELECT date FROM attendance WHERE student_id = ? AND date >= ? AND date <= ? ORDER BY date",
+            (student_id, start or "", end or MAX_DATE))
+        return [r[0] for r in cur]
+
+    def for_student(self, student_id, start=None, end=None):
+        cur = self.db.conn().execute(
+            f"SELECT {ATTENDANCE_COLS} FROM attendance WHERE student_id = ? AND date >= ? AND date <= ? ORDER BY date",
+            (student_id, start or "", end or MAX_DATE))
+        return [_entry(r) for r in cur]
+
+    def clear_date(self, date_str):
+        return self.db.conn().execute("DELETE FROM attendance WHERE date = ?", (date_str,)).rowcount
+
+    def delete_student(self, student_id):
+        return self.db.conn().execute("DELETE FROM attendance WHERE student_id = ?", (student_id,)).rowcount
+
+
+class SQLiteRollups:
+    # same interface as rollup.AttendanceRollups; the triggers in ROLLUP_SCHEMA do
+    # the bookkeeping, so the mutation hooks have nothing left to do
+    def __init__(self, db):
+        self.db = db
+        self.lock = db
+
+    def rebuild(self, students, attendance):
+        pass
+
+    def add(self, entry, student):
+        pass
+
+    def remove(self, entry, student):
+        pass
+
+    def move(self, entries, old, new):
+        pass
+
+    def clear_date(self, date_str):
+        pass
+
+    def counts(self, start=None, end=None, grade=None, section=None):
+        out = []
+        for d, status, n in self.db.conn().execute(ROLLUP_COUNTS, {
+                "start": start or "", "end": end or MAX_DATE, "grade": grade,
+                "section": section.lower() if section is not None else None}):
+            if not out or out[-1][0] != d:
+                out.append((d, {}))
+            if n:
+                out[-1][1][status] = n
+        return out
+
+
+class SQLiteFeed:
+    # the change feed as a table, so every worker sees every worker's events.
+    # publish() runs inside the mutation's transaction; readers poll by id.
+    epoch = "db"
+
+    def __init__(self, db, capacity=10000, poll_interval=0.5):
+        self.db = db
+        self.capacity = capacity
+        self.poll_interval = poll_interval
+        self._published = 0
+
+    def publish(self, kind, data):
+        conn = self.db.conn()
+        cur = conn.execute("INSERT INTO events (kind, data) VALUES (?, ?)", (kind, json.dumps(data)))
+        self._published += 1
+        if self._published % 1000 == 0:
+            conn.execute("DELETE FROM events WHERE id <= ?", (cur.lastrowid - self.capacity,))
+
+    def _latest(self, conn):
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def cursor(self):
+        return f"{self.epoch}-{self._latest(self.db.conn())}"
+
+    def read(self, cursor, timeout):
+        conn = self.db.conn()
+        epoch, seq = parse_cursor(cursor)
+        oldest = conn.execute("SELECT MIN(id) FROM events").fetchone()[0]
+        if epoch != self.epoch or seq > self._latest(conn) or (oldest and seq < oldest - 1):
+            return [(self.cursor(), RESET, {})]
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = conn.execute("SELECT id, kind, data FROM events WHERE id > ? ORDER BY id LIMIT 1000",
+                                (seq,)).fetchall()
+            if rows or time.monotonic() >= deadline:
+                return [(f"{self.epoch}-{i}", kind, json.loads(data)) for i, kind, data in rows]
+            time.sleep(self.poll_interval)
+
+
+def open_sqlite(path):
+    db = SQLiteDatabase(path)
+    return db, SQLiteStudentStore(db), SQLiteAttendanceStore(db)
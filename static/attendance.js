@@ -0,0 +1,31 @@
+const sid = parseInt(document.body.dataset.studentId, 10);
+async function checkStatus() {
+  const today = new Date().toISOString().slice(0,10);
+  const res = await fetch('/api/attendance?student_id=' + sid + '&date=' + today);
+  const data = await res.json();
+  if (data.status === 'success' && data.attendance.length) {
+    const a = data.attendance[0];
+    document.getElementById('todayStatus').innerText = a.status + ' at ' + new Date(a.timestamp).toLocaleTimeString();
+    document.getElementById('already').style.display = 'block';
+    document.getElementById('btnMark').disabled = true;
+  } else {
+    document.getElementById('todayStatus').innerText = 'Not marked yet';
+    document.getElementById('already').style.display = 'none';
+    document.getElementById('btnMark').disabled = false;
+  }
+}
+
+document.getElementById('btnMark').addEventListener('click', async () => {
+  const res = await fetch('/api/attendance', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({student_id: sid, status: 'Present'}) });
+  const data = await res.json();
+  if (res.status === 201 && data.status === 'success') {
+    document.getElementById('statusBox').style.display = 'block';
+    document.getElementById('statusBox').innerText = 'Attendance marked: ' + data.attendance.date + ' ' + new Date(data.attendance.timestamp).toLocaleTimeString();
+    checkStatus();
+  } else {
+    alert(data.message || 'Could not mark attendance');
+    checkStatus();
+  }
+});
+
+window.addEventListener('load', checkStatus);
@@ -0,0 +1,307 @@
+const apiBase = '/api';
+
+// conditional GETs: remember each URL's ETag and body; a 304 means nothing changed
+// and the caller can skip re-rendering
+const validators = new Map();
+async function fetchCached(url) {
+  const cached = validators.get(url);
+  const headers = cached ? {'If-None-Match': cached.etag} : {};
+  const res = await fetch(url, { headers, cache: 'no-store' });
+  if (res.status === 304 && cached) return { data: cached.data, changed: false };
+  const data = await res.json();
+  const etag = res.headers.get('ETag');
+  if (etag) validators.set(url, { etag, data }); else validators.delete(url);
+  return { data, changed: true };
+}
+
+// the roster is fetched a page at a time; later pages load as the table is scrolled
+const PAGE_SIZE = 100;
+let studentsQuery = '';
+let nextStudentsUrl = null;
+let loadingMore = false;
+
+function studentsUrl(q, cursor) {
+  const params = new URLSearchParams({ limit: PAGE_SIZE });
+  if (q) params.set('q', q);
+  if (cursor) params.set('cursor', cursor);
+  return apiBase + '/students?' + params;
+}
+
+function setNextPage(cursor) {
+  nextStudentsUrl = cursor ? studentsUrl(studentsQuery, cursor) : null;
+  document.getElementById('studentsMore').style.display = nextStudentsUrl ? '' : 'none';
+}
+
+// big tables are appended a slice per animation frame, so thousands of rows never
+// block the page; a newer render (gen) abandons an older one still in progress
+const RENDER_SLICE = 200;
+function appendRows(tbody, items, makeRow, isCurrent) {
+  let i = 0;
+  (function step() {
+    if (!isCurrent()) return;
+    const frag = document.createDocumentFragment();
+    for (const end = Math.min(i + RENDER_SLICE, items.length); i < end; i++) frag.appendChild(makeRow(items[i]));
+    tbody.appendChild(frag);
+    if (i < items.length) requestAnimationFrame(step);
+  })();
+}
+
+function cell(tr, text) {
+  const td = document.createElement('td');
+  td.textContent = text;
+  tr.appendChild(td);
+  return td;
+}
+
+// names seen in student pages and expanded attendance, for rows that arrive live
+const studentNames = new Map();
+
+function studentRow(s) {
+  studentNames.set(s.id, s.name);
+  const tr = document.createElement('tr');
+  [s.id, s.name, s.grade, s.section].forEach(v => cell(tr, v));
+  const actions = cell(tr, '');
+  ['edit', 'delete'].forEach(action => {
+    const b = document.createElement('button');
+    b.className = 'ghost small';
+    b.dataset.id = s.id;
+    b.dataset.action = action;
+    b.textContent = action === 'edit' ? 'Edit' : 'Delete';
+    actions.appendChild(b);
+  });
+  return tr;
+}
+
+let studentsGen = 0;
+function renderStudents(list, append) {
+  const tbody = document.getElementById('studentsTbody');
+  if (!append) { tbody.innerHTML = ''; studentsGen++; }
+  const gen = studentsGen;
+  appendRows(tbody, list, studentRow, () => gen === studentsGen);
+}
+
+async function refreshStudents() {
+  studentsQuery = document.getElementById('search').value.trim();
+  const { data: res, changed } = await fetchCached(studentsUrl(studentsQuery));
+  if (changed && res.status === 'success') {
+    renderStudents(res.students, false);
+    setNextPage(res.next_cursor);
+  }
+}
+
+async function loadMoreStudents() {
+  const url = nextStudentsUrl;
+  if (!url || loadingMore) return;
+  loadingMore = true;
+  try {
+    const res = await (await fetch(url)).json();
+    // ignore a page that arrives after the list was reloaded
+    if (res.status === 'success' && url === nextStudentsUrl) {
+      renderStudents(res.students, true);
+      setNextPage(res.next_cursor);
+    }
+  } finally {
+    loadingMore = false;
+  }
+}
+
+// today's attendance: rows keyed by student id, so live events update in O(1)
+const ATTENDANCE_PAGE = 500;
+const attendanceRows = new Map();
+let attendanceGen = 0;
+const pendingNames = new Map();
+
+function lookupName(id, td) {
+  // a live mark for a student we have not seen yet: fetch the name once
+  if (!pendingNames.has(id)) {
+    pendingNames.set(id, fetch(apiBase + '/students/' + id).then(r => r.json())
+      .then(d => { if (d.status === 'success') studentNames.set(id, d.student.name); return studentNames.get(id); }));
+  }
+  pendingNames.get(id).then(name => { if (name) td.textContent = name; });
+}
+
+function attendanceRow(a) {
+  const tr = document.createElement('tr');
+  if (a.student) studentNames.set(a.student_id, a.student.name);
+  const name = studentNames.get(a.student_id);
+  const td = cell(tr, name || ('#' + a.student_id));
+  if (!name) lookupName(a.student_id, td);
+  cell(tr, new Date(a.timestamp).toLocaleTimeString());
+  cell(tr, a.status);
+  attendanceRows.set(a.student_id, tr);
+  return tr;
+}
+
+function clearAttendanceRows() {
+  document.getElementById('attendanceTbody').innerHTML = '';
+  attendanceRows.clear();
+}
+
+async function refreshAttendance() {
+  const today = new Date().toISOString().slice(0,10);
+  document.getElementById('today').innerText = today;
+  // names come joined from the server (expand=student); the day arrives in pages
+  const url = apiBase + '/attendance?date=' + today + '&expand=student&limit=' + ATTENDANCE_PAGE;
+  let { data, changed } = await fetchCached(url);
+  if (!changed) return;
+  const gen = ++attendanceGen;
+  const isCurrent = () => gen === attendanceGen;
+  clearAttendanceRows();
+  const tbody = document.getElementById('attendanceTbody');
+  while (isCurrent() && data.status === 'success') {
+    appendRows(tbody, data.attendance, attendanceRow, isCurrent);
+    if (!data.next_cursor) break;
+    data = await (await fetch(url + '&cursor=' + encodeURIComponent(data.next_cursor))).json();
+  }
+}
+
+// live updates: apply each attendance event as it arrives instead of re-downloading
+// the day every 30s. Polling only runs while the stream is unavailable.
+let pollTimer = null;
+function startPolling() {
+  if (!pollTimer) pollTimer = setInterval(refreshAttendance, 30 * 1000);
+}
+function stopPolling() {
+  if (pollTimer) { clearInterval(pollTimer); pollTimer = null; }
+}
+
+function startLiveFeed() {
+  if (!window.EventSource) { startPolling(); return; }
+  const es = new EventSource(apiBase + '/attendance/stream');
+  const tbody = document.getElementById('attendanceTbody');
+  const today = () => new Date().toISOString().slice(0,10);
+  es.addEventListener('attendance.add', (e) => {
+    const a = JSON.parse(e.data);
+    if (a.date === today() && !attendanceRows.has(a.student_id)) {
+      tbody.appendChild(attendanceRow(a));
+    }
+  });
+  es.addEventListener('attendance.clear', (e) => {
+    if (JSON.parse(e.data).date === today()) clearAttendanceRows();
+  });
+  es.addEventListener('attendance.delete_student', (e) => {
+    const sid = JSON.parse(e.data).student_id;
+    const tr = attendanceRows.get(sid);
+    if (tr) { tr.remove(); attendanceRows.delete(sid); }
+  });
+  // the server could not resume our cursor (restart, or we were away too long)
+  es.addEventListener('reset', refreshAttendance);
+  es.onopen = () => { stopPolling(); refreshAttendance(); };
+  es.onerror = () => {
+    startPolling();
+    // a refused stream (503) is not retried by the browser; try again later
+    if (es.readyState === EventSource.CLOSED) setTimeout(startLiveFeed, 60 * 1000);
+  };
+}
+
+// event handlers for edit/delete/save
+document.addEventListener('click', async (e) => {
+  if (e.target.matches('button[data-action]')) {
+    const id = parseInt(e.target.dataset.id, 10);
+    const action = e.target.dataset.action;
+    if (action === 'edit') {
+      // populate form
+      const res = await fetch(apiBase + '/students/' + id);
+      const data = await res.json();
+      if (data.status === 'success') {
+        document.getElementById('editId').value = data.student.id;
+        document.getElementById('sname').value = data.student.name;
+        document.getElementById('sgrade').value = data.student.grade;
+        document.getElementById('ssection').value = data.student.section;
+        window.scrollTo({top:0, behavior:'smooth'});
+      } else alert(data.message || 'Could not load student');
+    } else if (action === 'delete') {
+      if (!confirm('Delete student and their attendance?')) return;
+      const res = await fetch(apiBase + '/students/' + id, { method: 'DELETE' });
+      const data = await res.json();
+      if (data.status === 'success') { refreshStudents(); refreshAttendance(); } else alert(data.message);
+    }
+  }
+});
+
+document.getElementById('btnSave').addEventListener('click', async () => {
+  const id = document.getElementById('editId').value;
+  const name = document.getElementById('sname').value.trim();
+  const grade = document.getElementById('sgrade').value;
+  const section = document.getElementById('ssection').value.trim();
+
+  if (!name || !grade || !section) { alert('All fields required'); return; }
+
+  const payload = { name, grade: parseInt(grade,10), section };
+
+  if (id) {
+    const res = await fetch(apiBase + '/students/' + id, { method: 'PUT', headers: {'Content-Type':'application/json'}, body: JSON.stringify(payload) });
+    const data = await res.json();
+    if (data.status === 'success') { clearForm(); refreshStudents(); refreshAttendance(); } else alert(data.message);
+  } else {
+    const res = await fetch(apiBase + '/students', { method: 'POST', headers: {'Content-Type':'application/json'}, body: JSON.stringify(payload) });
+    const data = await res.json();
+    if (data.status === 'success') { clearForm(); refreshStudents(); } else alert(data.message);
+  }
+});
+
+document.getElementById('btnClear').addEventListener('click', clearForm);
+document.getElementById('btnRefresh').addEventListener('click', () => { document.getElementById('search').value=''; refreshStudents(); });
+document.getElementById('btnSearch').addEventListener('click', refreshStudents);
+document.getElementById('btnMore').addEventListener('click', loadMoreStudents);
+
+// typeahead: ask for the best few name matches once typing pauses
+let suggestTimer = null;
+document.getElementById('search').addEventListener('input', (e) => {
+  clearTimeout(suggestTimer);
+  const q = e.target.value.trim();
+  suggestTimer = setTimeout(async () => {
+    const list = document.getElementById('searchSuggest');
+    if (!q) { list.innerHTML = ''; return; }
+    const { data } = await fetchCached(apiBase + '/students/suggest?q=' + encodeURIComponent(q));
+    if (data.status !== 'success' || document.getElementById('search').value.trim() !== q) return;
+    list.innerHTML = '';
+    data.students.forEach(s => {
+      const opt = document.createElement('option');
+      opt.value = s.name;
+      opt.label = 'Grade ' + s.grade + ' • ' + s.section;
+      list.appendChild(opt);
+    });
+  }, 150);
+});
+document.getElementById('search').addEventListener('keydown', (e) => {
+  if (e.key === 'Enter') refreshStudents();
+});
+if (window.IntersectionObserver) {
+  new IntersectionObserver((entries) => {
+    if (entries.some(e => e.isIntersecting)) loadMoreStudents();
+  }).observe(document.getElementById('studentsMore'));
+}
+// exports stream from the server (NDJSON / CSV) for any date range; the browser just downloads
+function exportAttendance(format) {
+  const today = new Date().toISOString().slice(0,10);
+  const from = document.getElementById('exportFrom').value || today;
+  const to = document.getElementById('exportTo').value || from;
+  window.location.href = apiBase + '/attendance/export?format=' + format +
+    '&from=' + encodeURIComponent(from) + '&to=' + encodeURIComponent(to);
+}
+document.getElementById('btnExport').addEventListener('click', () => exportAttendance('ndjson'));
+document.getElementById('btnExportCsv').addEventListener('click', () => exportAttendance('csv'));
+
+document.getElementById('btnClearAll').addEventListener('click', async () => {
+  if (!confirm('Clear today\'s attendance? This cannot be undone in-memory.')) return;
+  // call server endpoint to clear today's attendance
+  const today = new Date().toISOString().slice(0,10);
+  const res = await fetch(apiBase + '/attendance/clear?date=' + today, { method: 'POST' });
+  const data = await res.json();
+  if (data.status === 'success') refreshAttendance();
+  else alert(data.message || 'Failed');
+});
+
+function clearForm() {
+  document.getElementById('editId').value = '';
+  document.getElementById('sname').value = '';
+  document.getElementById('sgrade').value = '';
+  document.getElementById('ssection').value = '';
+}
+
+window.addEventListener('load', () => {
+  refreshStudents();
+  refreshAttendance();
+  startLiveFeed();
+});
@@ -0,0 +1,12 @@
+document.getElementById('btnLogin').addEventListener('click', async () => {
+  const id = document.getElementById('sid').value.trim();
+  const name = document.getElementById('sname').value.trim();
+  if (!id || !name) { alert('Both fields required'); return; }
+  const res = await fetch('/api/login', { method: 'POST', headers: {'Content-Type':'application/json'}, body: JSON.stringify({id, name}) });
+  const data = await res.json();
+  if (res.status === 200 && data.status === 'success') {
+    window.location.href = data.redirect;
+  } else {
+    alert(data.message || 'Login failed');
+  }
+});
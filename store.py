@@ -0,0 +1,697 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+
+from search import NameIndex
+
+# --------------------
+# Reader/writer lock shared by the stores: readers (dashboard polling, logins)
+# run concurrently, a writer gets exclusive access. Both sides are re-entrant per
+# thread, and a writer may also read, so mutation helpers can hold the write lock
+# across several store calls (and the journal append) to make them atomic.
+# --------------------
+class RWLock:
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        depth = getattr(self._local, "reads", 0)
+        if self._writer == me or depth:
+            self._local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self._local.reads = depth
+            return
+        with self._cond:
+            # waiting writers go first so a stream of readers cannot starve them
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reads = 1
+        try:
+            yield
+        finally:
+            self._local.reads = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._write_depth += 1
+            try:
+                yield
+            finally:
+                self._write_depth -= 1
+            return
+        if getattr(self._local, "reads", 0):
+            raise RuntimeError("cannot upgrade a read lock to a write lock")
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+
+def reads(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+    return locked
+
+def writes(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.write():
+            return method(self, *args, **kwargs)
+    return locked
+
+# --------------------
+# Version clock: a monotonic change counter plus last-modified time per scope
+# (the roster, or one attendance day). Tokens carry a per-process epoch so a
+# validator from before a restart never matches.
+# --------------------
+class VersionClock:
+    def __init__(self):
+        self.epoch = format(time.time_ns(), "x")
+        self.created = time.time()
+        self._tick = 0
+        self._scopes = {}      # scope -> (tick, modified)
+
+    def bump(self, scope):
+        self._tick += 1
+        self._scopes[scope] = (self._tick, time.time())
+
+    def tick(self, scope):
+        return self._scopes.get(scope, (0, self.created))
+
+    def token(self, tick):
+        return f"{self.epoch}.{tick}"
+
+
+# --------------------
+# Student store: primary id -> record map plus secondary indexes
+# --------------------
+def login_name(name):
+    # what /api/login compares: case-insensitive, surrounding spaces ignored
+    return (name or "").strip().lower()
+
+class StudentStore:
+    # records are never mutated in place (update swaps in a new dict), so a record
+    # handed to a reader stays consistent while it is being serialized
+    def __init__(self, records=(), lock=None):
+        self.lock = lock or RWLock()
+        self._by_id = {}
+        self._ids = []                                 # sorted ids, for paging
+        self._by_grade = defaultdict(set)
+        self._by_section = defaultdict(set)            # keyed by lowercase section
+        self._by_grade_section = defaultdict(set)      # keyed by (grade, lowercase section)
+        self._names = NameIndex()                      # trigram postings for name search
+        self._login_names = {}                         # id -> login_name(name)
+        self._next_id = 1
+        self._clock = VersionClock()
+        for r in records:
+            self.add(dict(r))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def version(self):
+        # (etag token, last-modified epoch seconds) for the whole roster
+        tick, modified = self._clock.tick("roster")
+        return self._clock.token(tick), modified
+
+    @reads
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    # single dict lookups are atomic under the GIL, so the hot-path point reads skip the lock
+    def __contains__(self, student_id):
+        return student_id in self._by_id
+
+    def get(self, student_id):
+        return self._by_id.get(student_id)
+
+    def get_many(self, student_ids):
+        # lock-free like get(): one dict lookup per id, so a racing delete just drops it
+        out = {}
+        for i in student_ids:
+            s = self._by_id.get(i)
+            if s is not None:
+                out[i] = s
+        return out
+
+    def login_lookup(self, student_id):
+        # (record, login_name) with the name normalized once at write time
+        s = self._by_id.get(student_id)
+        return (s, self._login_names.get(student_id)) if s is not None else (None, None)
+
+    @writes
+    def allocate_id(self):
+        sid = self._next_id
+        self._next_id += 1
+        return sid
+
+    @writes
+    def allocate_ids(self, count):
+        # reserve a contiguous block of ids, returning the first
+        first = self._next_id
+        self._next_id += count
+        return first
+
+    def peek_id(self):
+        return self._next_id
+
+    @writes
+    def reserve_ids(self, next_id):
+        # never hand out ids below next_id (used when restoring a snapshot)
+        self._next_id = max(self._next_id, next_id)
+
+    @writes
+    def add(self, record):
+        sid = record.get("id")
+        if sid is None:
+            sid = record["id"] = self.allocate_id()
+        elif sid >= self._next_id:
+            self._next_id = sid + 1
+        if sid in self._by_id:
+            raise KeyError(f"duplicate student id {sid}")
+        self._by_id[sid] = record
+        if self._ids and sid < self._ids[-1]:
+            insort(self._ids, sid)
+        else:
+            self._ids.append(sid)
+        self._index(record)
+        self._clock.bump("roster")
+        return record
+
+    @writes
+    def add_many(self, records):
+        for r in records:
+            self.add(r)
+        return records
+
+    @writes
+    def update(self, student_id, **fields):
+        old = self._by_id.get(student_id)
+        if old is None:
+            return None
+        s = {**old, **fields}
+        self._unindex(old)
+        self._by_id[student_id] = s
+        self._index(s)
+        self._clock.bump("roster")
+        return s
+
+    @writes
+    def delete(self, student_id):
+        s = self._by_id.pop(student_id, None)
+        if s is not None:
+            del self._ids[bisect_left(self._ids, student_id)]
+            self._unindex(s)
+            self._clock.bump("roster")
+        return s
+
+    def count(self, grade=None, section=None):
+        # students in a grade/section straight from the index sizes
+        if grade is None and section is None:
+            return len(self._by_id)
+        if grade is not None and section is not None:
+            return len(self._by_grade_section.get((grade, section.lower()), ()))
+        if grade is not None:
+            return len(self._by_grade.get(grade, ()))
+        return len(self._by_section.get(section.lower(), ()))
+
+    @reads
+    def ids(self, grade=None, section=None):
+        # set of ids in a grade/section (a copy: the index sets keep changing)
+        if grade is None and section is None:
+            return set(self._by_id)
+        if grade is not None and section is not None:
+            return set(self._by_grade_section.get((grade, section.lower()), ()))
+        if grade is not None:
+            return set(self._by_grade.get(grade, ()))
+        return set(self._by_section.get(section.lower(), ()))
+
+    @reads
+    def query(self, grade=None, section=None, after=None, limit=None):
+        # answer filter combinations straight from the indexes, in id order;
+        # after/limit select one page (at most limit records with id > after)
+        if grade is None and section is None:
+            ids = self._ids
+        elif grade is not None and section is not None:
+            ids = sorted(self._by_grade_section.get((grade, section.lower()), ()))
+        elif grade is not None:
+            ids = sorted(self._by_grade.get(grade, ()))
+        else:
+            ids = sorted(self._by_section.get(section.lower(), ()))
+        lo = bisect_right(ids, after) if after is not None else 0
+        hi = lo + limit if limit is not None else len(ids)
+        return [self._by_id[i] for i in ids[lo:hi]]
+
+    @reads
+    def search(self, q, grade=None, section=None, after=None, limit=None):
+        # students whose name contains q (case-insensitive), same paging as query()
+        ids = self._names.match(q)
+        if grade is not None and section is not None:
+            ids &= self._by_grade_section.get((grade, section.lower()), set())
+        elif grade is not None:
+            ids &= self._by_grade.get(grade, set())
+        elif section is not None:
+            ids &= self._by_section.get(section.lower(), set())
+        ids = sorted(i for i in ids if after is None or i > after)
+        return [self._by_id[i] for i in ids[:limit]]
+
+    @reads
+    def suggest(self, q, limit=10):
+        # ranked matches for typeahead: exact name, then prefix, word prefix, substring
+        return [self._by_id[i] for i in self._names.suggest(q, limit)]
+
+    # --------------------
+    # index maintenance
+    # --------------------
+    def _keys(self, s):
+        grade = s.get("grade")
+        section = (s.get("section") or "").lower()
+        return grade, section
+
+    def _index(self, s):
+        grade, section = self._keys(s)
+        sid = s["id"]
+        self._by_grade[grade].add(sid)
+        self._by_section[section].add(sid)
+        self._by_grade_section[(grade, section)].add(sid)
+        self._names.add(sid, s.get("name") or "")
+        self._login_names[sid] = login_name(s.get("name"))
+
+    def _unindex(self, s):
+        grade, section = self._keys(s)
+        sid = s["id"]
+        self._names.remove(sid)
+        self._login_names.pop(sid, None)
+        for index, key in ((self._by_grade, grade),
+                           (self._by_section, section),
+                           (self._by_grade_section, (grade, section))):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.discard(sid)
+                if not bucket:
+                    del index[key]
+
+
+# --------------------
+# Attendance day partitions
+# --------------------
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+ENTRY_FIELDS = frozenset(("student_id", "status", "timestamp", "date"))
+
+def _encode_ts(ts):
+    # "2025-10-26T08:00:00.123456Z" -> microseconds since epoch, or None when the
+    # string would not round-trip exactly (it is then kept verbatim)
+    if not isinstance(ts, str) or not ts.endswith("Z"):
+        return None
+    try:
+        us = (datetime.fromisoformat(ts[:-1]) - EPOCH) // ONE_MICROSECOND
+    except ValueError:
+        return None
+    return us if _decode_ts(us) == ts else None
+
+def _decode_ts(us):
+    return (EPOCH + timedelta(microseconds=us)).isoformat() + "Z"
+
+
+class DayPartition:
+    # open (writable) day: student_id -> entry dict, in marking order
+    frozen = False
+
+    def __init__(self, date_str, entries=None):
+        self.date = date_str
+        self.entries = entries if entries is not None else {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, student_id):
+        return student_id in self.entries
+
+    def __iter__(self):
+        return iter(list(self.entries.values()))
+
+    def get(self, student_id):
+        return self.entries.get(student_id)
+
+    def add(self, entry):
+        sid = entry["student_id"]
+        if sid in self.entries:
+            return False
+        self.entries[sid] = entry
+        return True
+
+    def remove(self, student_id):
+        return self.entries.pop(student_id, None) is not None
+
+    def student_ids(self):
+        return set(self.entries)
+
+    def rows(self):
+        return [(e["student_id"], e["status"], e["timestamp"]) for e in self.entries.values()]
+
+    def after(self, student_id=None):
+        # entries in student id order, starting past student_id
+        ids = sorted(self.entries)
+        lo = bisect_right(ids, student_id) if student_id is not None else 0
+        return [self.entries[i] for i in ids[lo:]]
+
+    def freeze(self):
+        return FrozenDayPartition.from_entries(self.date, self.entries.values())
+
+    def thaw(self):
+        return self
+
+
+class FrozenDayPartition:
+    # read-only past day packed into parallel arrays: no dict per row.
+    # rows stay in marking order; a sorted copy of the ids answers point lookups.
+    frozen = True
+    __slots__ = ("date", "_ids", "_ts", "_status", "_statuses", "_raw_ts", "_sorted_ids", "_rows")
+
+    def __init__(self, date_str, ids, ts, status, statuses, raw_ts=None):
+        self.date = date_str
+        self._ids = ids
+        self._ts = ts
+        self._status = status
+        self._statuses = statuses
+        self._raw_ts = raw_ts or {}      # row -> timestamp string that did not pack
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        self._sorted_ids = array("q", (ids[i] for i in order))
+        self._rows = array("l", order)
+
+    @classmethod
+    def from_entries(cls, date_str, entries):
+        ids, ts, status = array("q"), array("q"), array("B")
+        codes, raw_ts = {}, {}
+        for e in entries:
+            if e.keys() != ENTRY_FIELDS or e["date"] != date_str or not isinstance(e["status"], str):
+                raise ValueError("entry cannot be packed")
+            code = codes.setdefault(e["status"], len(codes))
+            if code > 255:
+                raise ValueError("too many distinct statuses")
+            us = _encode_ts(e["timestamp"])
+            if us is None:
+                raw_ts[len(ids)] = e["timestamp"]
+            ids.append(e["student_id"])
+            ts.append(us or 0)
+            status.append(code)
+        return cls(date_str, ids, ts, status, tuple(codes), raw_ts)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, student_id):
+        return self._row(student_id) is not None
+
+    def __iter__(self):
+        for i in range(len(self._ids)):
+            yield self._entry(i)
+
+    def student_ids(self):
+        return set(self._ids)
+
+    def _row(self, student_id):
+        i = bisect_left(self._sorted_ids, student_id)
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == student_id:
+            return self._rows[i]
+        return None
+
+    def _timestamp(self, i):
+        raw = self._raw_ts.get(i)
+        return raw if raw is not None else _decode_ts(self._ts[i])
+
+    def _entry(self, i):
+        return {"student_id": self._ids[i], "status": self._statuses[self._status[i]],
+                "timestamp": self._timestamp(i), "date": self.date}
+
+    def get(self, student_id):
+        i = self._row(student_id)
+        return None if i is None else self._entry(i)
+
+    def rows(self):
+        for i in range(len(self._ids)):
+            yield self._ids[i], self._statuses[self._status[i]], self._timestamp(i)
+
+    def after(self, student_id=None):
+        lo = bisect_right(self._sorted_ids, student_id) if student_id is not None else 0
+        for j in range(lo, len(self._sorted_ids)):
+            yield self._entry(self._rows[j])
+
+    def without(self, student_id):
+        i = self._row(student_id)
+        if i is None:
+            return self
+        keep = [j for j in range(len(self._ids)) if j != i]
+        raw_ts = {n: self._raw_ts[j] for n, j in enumerate(keep) if j in self._raw_ts}
+        return FrozenDayPartition(self.date,
+                                  array("q", (self._ids[j] for j in keep)),
+                                  array("q", (self._ts[j] for j in keep)),
+                                  array("B", (self._status[j] for j in keep)),
+                                  self._statuses, raw_ts)
+
+    def freeze(self):
+        return self
+
+    def thaw(self):
+        return DayPartition(self.date, {e["student_id"]: e for e in self})
+
+
+# --------------------
+# Attendance store: one partition per day, plus a per-student day index
+# --------------------
+class AttendanceStore:
+    # entry dicts are never mutated once stored, and frozen partitions are
+    # immutable (edits replace them), so both can be handed out past the lock
+    def __init__(self, entries=(), lock=None):
+        self.lock = lock or RWLock()
+        self._days = {}          # date -> DayPartition / FrozenDayPartition
+        self._day_keys = []      # sorted dates, for range walks
+        self._open = set()       # dates whose partition is still writable
+        self._latest = None
+        # student_id -> sorted dates. Kept lazily: dropping a day does not touch it,
+        # stale dates are pruned the next time the student is read.
+        self._by_student = {}
+        self._count = 0
+        # per-day versions; days stay listed after being cleared so a cleared day
+        # never gets an old validator back
+        self._clock = VersionClock()
+        self._version_days = []
+        for e in entries:
+            self.add(dict(e))
+
+    def __len__(self):
+        return self._count
+
+    def _touch(self, date_str):
+        if date_str not in self._clock._scopes:
+            insort(self._version_days, date_str)
+        self._clock.bump(date_str)
+
+    def day_version(self, date_str):
+        tick, modified = self._clock.tick(date_str)
+        return self._clock.token(tick), modified
+
+    @reads
+    def range_version(self, start=None, end=None):
+        lo = bisect_left(self._version_days, start) if start else 0
+        hi = bisect_right(self._version_days, end) if end else len(self._version_days)
+        tick, modified = 0, self._clock.created
+        for d in self._version_days[lo:hi]:
+            t, m = self._clock.tick(d)
+            if t > tick:
+                tick, modified = t, m
+        return self._clock.token(tick), modified
+
+    @reads
+    def days(self):
+        return list(self._day_keys)
+
+    def day_count(self):
+        return len(self._day_keys)
+
+    def get(self, student_id, date_str):
+        # lock-free: each lookup is atomic and a partition is either immutable or a dict
+        part = self._days.get(date_str)
+        return part.get(student_id) if part is not None else None
+
+    @writes
+    def add(self, entry):
+        # returns False when the student already has an entry for that day
+        sid, d = entry["student_id"], entry["date"]
+        part = self._days.get(d)
+        if part is None:
+            part = self._days[d] = DayPartition(d)
+            insort(self._day_keys, d)
+            self._open.add(d)
+            if self._latest is None or d > self._latest:
+                self._latest = d
+                self.freeze_before(d)
+        elif part.frozen:
+            if sid in part:
+                return False
+            # back-filling a past day: reopen it, it is frozen again on the next rollover
+            part = self._days[d] = part.thaw()
+            self._open.add(d)
+        if not part.add(entry):
+            return False
+        dates = self._by_student.setdefault(sid, [])
+        i = bisect_left(dates, d)
+        if i == len(dates) or dates[i] != d:
+            dates.insert(i, part.date)
+        self._count += 1
+        self._touch(d)
+        return True
+
+    @writes
+    def add_many(self, entries):
+        # all-or-nothing under one write lock; a created flag per entry
+        return [self.add(e) for e in entries]
+
+    @writes
+    def restore_day(self, date_str, entries):
+        # bulk-load a whole day (snapshot recovery); entries must not be on file yet
+        for e in entries:
+            self.add(e)
+        if self._latest and date_str < self._latest:
+            self.freeze_before(self._latest)
+
+    @reads
+    def snapshot(self):
+        # (date, rows) for every day. Frozen partitions are immutable, so their rows
+        # are read lazily (possibly from another thread); open days are copied now.
+        return [(d, self._days[d].rows()) for d in self._day_keys]
+
+    @writes
+    def freeze_before(self, date_str):
+        # pack every open day older than date_str into its array-backed form
+        for d in [d for d in self._open if d < date_str]:
+            try:
+                self._days[d] = self._days[d].freeze()
+            except ValueError:
+                continue
+            self._open.discard(d)
+
+    @reads
+    def marked_ids(self, date_str):
+        # ids of the students with an entry on date_str
+        part = self._days.get(date_str)
+        if part is None:
+            return set()
+        return part.student_ids()
+
+    @reads
+    def for_date(self, date_str):
+        part = self._days.get(date_str)
+        return list(part) if part is not None else []
+
+    @reads
+    def _partitions(self, start, end):
+        lo = bisect_left(self._day_keys, start) if start else 0
+        hi = bisect_right(self._day_keys, end) if end else len(self._day_keys)
+        # frozen partitions are immutable; open ones are copied while the lock is held
+        return [p if p.frozen else list(p) for p in (self._days[d] for d in self._day_keys[lo:hi])]
+
+    def for_range(self, start=None, end=None):
+        # walk only the partitions between start and end (inclusive ISO dates),
+        # without holding the lock while the caller consumes the rows
+        for part in self._partitions(start, end):
+            yield from part
+
+    @reads
+    def page(self, start=None, end=None, after=None, limit=None):
+        # entries between start and end ordered by (date, student_id), beginning past
+        # the key after = (date, student_id). Keys never move, so paging with the last
+        # key seen neither repeats nor skips rows when others are marked meanwhile.
+        if after is not None and (start is None or after[0] > start):
+            start = after[0]
+        lo = bisect_left(self._day_keys, start) if start else 0
+        hi = bisect_right(self._day_keys, end) if end else len(self._day_keys)
+        rows = []
+        for d in self._day_keys[lo:hi]:
+            sid = after[1] if after is not None and d == after[0] else None
+            for e in self._days[d].after(sid):
+                if len(rows) == limit:
+                    return rows
+                rows.append(e)
+        return rows
+
+    @reads
+    def student_dates(self, student_id, start=None, end=None):
+        dates = self._by_student.get(student_id)
+        if not dates:
+            return []
+        live = [d for d in dates if student_id in self._days.get(d, ())]
+        if len(live) != len(dates):
+            # lazy pruning under the read lock: concurrent readers compute the same list
+            if live:
+                self._by_student[student_id] = live
+            else:
+                self._by_student.pop(student_id, None)
+        lo = bisect_left(live, start) if start else 0
+        hi = bisect_right(live, end) if end else len(live)
+        return live[lo:hi]
+
+    @reads
+    def for_student(self, student_id, start=None, end=None):
+        return [self._days[d].get(student_id) for d in self.student_dates(student_id, start, end)]
+
+    @writes
+    def clear_date(self, date_str):
+        # a single partition drop; per-student indexes are pruned lazily
+        part = self._days.pop(date_str, None)
+        if part is None:
+            return 0
+        del self._day_keys[bisect_left(self._day_keys, date_str)]
+        self._open.discard(date_str)
+        self._count -= len(part)
+        self._touch(date_str)
+        return len(part)
+
+    @writes
+    def delete_student(self, student_id):
+        removed = 0
+        for d in self.student_dates(student_id):
+            part = self._days[d]
+            if part.frozen:
+                self._days[d] = part = part.without(student_id)
+            else:
+                part.remove(student_id)
+            removed += 1
+            self._touch(d)
+            if not len(part):
+                self.clear_date(d)
+        self._by_student.pop(student_id, None)
+        self._count -= removed
+        return removed
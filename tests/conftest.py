@@ -0,0 +1,27 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+# --------------------
+# The app module builds its stores, feed and rollups at import time from the
+# FLASK_* environment, so each test gets a fresh import for the backend it asks for.
+# --------------------
+@pytest.fixture(params=["memory", "sqlite"])
+def app_module(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("FLASK_STORAGE_BACKEND", request.param)
+    monkeypatch.setenv("FLASK_SQLITE_PATH", str(tmp_path / "attendance.db"))
+    monkeypatch.setenv("FLASK_METRICS_DIR", str(tmp_path / "metrics"))
+    monkeypatch.setenv("FLASK_RATE_LIMIT_ENABLED", "false")
+    monkeypatch.delenv("FLASK_AUTO_ABSENT_AT", raising=False)
+    monkeypatch.delenv("FLASK_DATA_DIR", raising=False)
+    sys.modules.pop("app", None)
+    module = importlib.import_module("app")
+    yield module
+    sys.modules.pop("app", None)
@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from persistence import Journal, apply_record
+from store import AttendanceStore, StudentStore
+
+
+def mark(student_id, date_str, status="Present"):
+    return {"student_id": student_id, "status": status,
+            "timestamp": date_str + "T08:00:00Z", "date": date_str}
+
+
+def open_journal(data_dir):
+    stores = StudentStore(), AttendanceStore()
+    journal = Journal(str(data_dir), fsync="never", snapshot_every=10 ** 9)
+    journal.recover(*stores)
+    return journal, stores
+
+
+def record(journal, stores, op, **data):
+    # what the app's mutation helpers do: change the stores, then log the change
+    apply_record(*stores, {"op": op, **data})
+    journal.append(op, **data)
+
+
+def state(stores):
+    students, attendance = stores
+    roster = sorted((s["id"], s["name"], s["grade"], s["section"]) for s in students)
+    marks = sorted((e["date"], e["student_id"], e["status"], e["timestamp"]) for e in attendance.for_range())
+    return roster, marks
+
+
+def test_recover_replays_log_after_snapshot(tmp_path):
+    journal, stores = open_journal(tmp_path)
+    assert journal.fresh
+    record(journal, stores, "student.add_many", students=[
+        {"id": 1, "name": "Ann Lee", "grade": 9, "section": "A"},
+        {"id": 2, "name": "Bo Chan", "grade": 9, "section": "B"},
+    ])
+    record(journal, stores, "attendance.add_many",
+           entries=[mark(1, "2025-03-03"), mark(2, "2025-03-03", "Absent")])
+    journal.snapshot(background=False)
+    # after the snapshot: these only exist in the log tail
+    record(journal, stores, "student.add",
+           student={"id": 3, "name": "Cy Diaz", "grade": 10, "section": "A"})
+    record(journal, stores, "student.update", id=2, fields={"grade": 10})
+    record(journal, stores, "attendance.add", entry=mark(3, "2025-03-04", "Late"))
+    record(journal, stores, "attendance.clear", date="2025-03-03")
+    record(journal, stores, "student.delete", id=1)
+    expected = state(stores)
+    journal.close()
+
+    names = sorted(os.listdir(tmp_path))
+    assert [n for n in names if n.startswith("snapshot-")] == ["snapshot-000000000002.jsonl"]
+    assert [n for n in names if n.startswith("wal-")] == ["wal-000000000002.log"]
+
+    journal, stores = open_journal(tmp_path)
+    assert not journal.fresh
+    assert state(stores) == expected
+    assert stores[0].peek_id() == 4
+    journal.close()
+
+
+def test_recover_drops_torn_tail(tmp_path):
+    journal, stores = open_journal(tmp_path)
+    record(journal, stores, "student.add",
+           student={"id": 1, "name": "Ann Lee", "grade": 9, "section": "A"})
+    record(journal, stores, "attendance.add", entry=mark(1, "2025-03-03"))
+    expected = state(stores)
+    journal.close()
+
+    # a crash mid-write leaves half a record without its newline
+    wal = os.path.join(tmp_path, "wal-000000000000.log")
+    with open(wal, "ab") as f:
+        f.write(b'{"seq":2,"op":"attendance.add","entry":{"student_id":1,"sta')
+
+    journal, stores = open_journal(tmp_path)
+    assert state(stores) == expected
+    # the torn bytes are gone, so the next record starts on a clean line
+    record(journal, stores, "attendance.add", entry=mark(1, "2025-03-04", "Absent"))
+    expected = state(stores)
+    journal.close()
+    with open(wal, "rb") as f:
+        assert f.read().count(b"\n") == 3
+
+    journal, stores = open_journal(tmp_path)
+    assert state(stores) == expected
+    journal.close()
+
+
+def test_data_dir_is_locked(tmp_path):
+    journal, stores = open_journal(tmp_path)
+    with pytest.raises(RuntimeError):
+        Journal(str(tmp_path), fsync="never")
+    journal.close()
+    open_journal(tmp_path)[0].close()
+
+
+def test_close_waits_for_background_snapshot(tmp_path):
+    journal, stores = open_journal(tmp_path)
+    record(journal, stores, "attendance.add_many", entries=[mark(i, "2025-03-03") for i in range(5000)])
+    journal.snapshot()
+    journal.close()
+    assert sorted(os.listdir(tmp_path)) == ["lock", "snapshot-000000000001.jsonl", "wal-000000000001.log"]
+
+
+def test_recover_removes_unfinished_snapshot(tmp_path):
+    journal, stores = open_journal(tmp_path)
+    record(journal, stores, "attendance.add", entry=mark(1, "2025-03-03"))
+    expected = state(stores)
+    journal.close()
+    with open(os.path.join(tmp_path, "snapshot-000000000001.jsonl.tmp"), "wb") as f:
+        f.write(b'["meta", {"seq": 1')
+
+    journal, stores = open_journal(tmp_path)
+    assert state(stores) == expected
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+    journal.close()
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import RequestMetrics
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def write_worker(directory, pid, count):
+    # the file a worker that has since exited left behind
+    snap = {"pid": pid, "ppid": os.getppid(), "bounds": [0.005, 0.05],
+            "routes": [["GET", "api_get_students", {"200": count}, [count, 0, 0], 0.001 * count]],
+            "gauges": {"students": ["Students.", 7]}, "written": 0}
+    with open(os.path.join(directory, f"metrics-{pid}.json"), "w") as f:
+        json.dump(snap, f)
+
+
+def total(text):
+    line = next(l for l in text.splitlines()
+                if l.startswith('attendance_http_requests_total{method="GET",endpoint="api_get_students"'))
+    return int(line.rsplit(" ", 1)[1])
+
+
+def test_dead_workers_are_folded_into_one_file(tmp_path):
+    metrics = RequestMetrics(buckets_ms=(5, 50), directory=str(tmp_path))
+    metrics.observe("GET", "api_get_students", 200, 0.001)
+    first, second = dead_pid(), dead_pid()
+    write_worker(tmp_path, first, 3)
+    write_worker(tmp_path, second, 4)
+
+    text = metrics.render()
+    assert total(text) == 8
+    assert "attendance_students" not in text           # gauges only come from live workers
+    files = sorted(n for n in os.listdir(tmp_path) if n.endswith(".json"))
+    assert files == [f"metrics-{os.getpid()}.json", "metrics-retired.json"]
+
+    assert total(metrics.render()) == 8                # folding again changes nothing
+    third = dead_pid()
+    write_worker(tmp_path, third, 5)
+    assert total(metrics.render()) == 13
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".json")]) == 2
@@ -0,0 +1,63 @@
+DAY1, DAY2 = "2025-03-03", "2025-03-04"
+
+
+def mark(student_id, date_str, status):
+    return {"student_id": student_id, "status": status,
+            "timestamp": date_str + "T08:00:00Z", "date": date_str}
+
+
+def counts(app_module, **groups):
+    return dict(app_module.rollups.counts(DAY1, DAY2, **groups))
+
+
+def setup_marks(app_module):
+    ann, bo, cy = app_module.add_students([
+        {"name": "Ann Lee", "grade": 9, "section": "A"},
+        {"name": "Bo Chan", "grade": 9, "section": "A"},
+        {"name": "Cy Diaz", "grade": 10, "section": "B"},
+    ])
+    app_module.add_attendance_many([
+        mark(ann["id"], DAY1, "Present"), mark(bo["id"], DAY1, "Absent"), mark(cy["id"], DAY1, "Present"),
+        mark(ann["id"], DAY2, "Late"), mark(bo["id"], DAY2, "Present"),
+    ])
+    return ann, bo, cy
+
+
+def test_marks_are_counted_per_group(app_module):
+    setup_marks(app_module)
+    assert counts(app_module, grade=9, section="a") == {
+        DAY1: {"Present": 1, "Absent": 1}, DAY2: {"Late": 1, "Present": 1}}
+    # every day with any marks is listed, empty for groups not marked that day
+    assert counts(app_module, grade=10) == {DAY1: {"Present": 1}, DAY2: {}}
+    assert counts(app_module) == {DAY1: {"Present": 2, "Absent": 1}, DAY2: {"Late": 1, "Present": 1}}
+
+
+def test_grade_change_moves_counts(app_module):
+    _, bo, _ = setup_marks(app_module)
+    app_module.update_student(bo["id"], grade=10, section="B")
+    assert counts(app_module, grade=9) == {DAY1: {"Present": 1}, DAY2: {"Late": 1}}
+    assert counts(app_module, grade=10, section="B") == {
+        DAY1: {"Present": 1, "Absent": 1}, DAY2: {"Present": 1}}
+    # the school-wide totals do not change
+    assert counts(app_module) == {DAY1: {"Present": 2, "Absent": 1}, DAY2: {"Late": 1, "Present": 1}}
+
+
+def test_delete_removes_counts(app_module):
+    ann, _, cy = setup_marks(app_module)
+    app_module.delete_student(ann["id"])
+    assert counts(app_module, grade=9) == {DAY1: {"Absent": 1}, DAY2: {"Present": 1}}
+    app_module.delete_student(cy["id"])
+    assert counts(app_module, grade=10) == {DAY1: {}, DAY2: {}}
+    assert counts(app_module) == {DAY1: {"Absent": 1}, DAY2: {"Present": 1}}
+
+
+def test_summary_endpoint_follows_changes(app_module):
+    ann, bo, _ = setup_marks(app_module)
+    client = app_module.app.test_client()
+    url = f"/api/attendance/summary?grade=9&from={DAY1}&to={DAY2}"
+    assert client.get(url).get_json()["totals"]["present"] == 2
+    app_module.update_student(bo["id"], grade=11)
+    app_module.delete_student(ann["id"])
+    body = client.get(url).get_json()
+    assert body["enrolled"] == 0
+    assert body["totals"]["marked"] == 0
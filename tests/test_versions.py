@@ -0,0 +1,24 @@
+DAY = "2025-03-03"
+
+
+def mark(app_module, student_id):
+    app_module.add_attendance_many([{"student_id": student_id, "status": "Present",
+                                     "timestamp": DAY + "T08:00:00Z", "date": DAY}])
+
+
+def test_every_mark_changes_the_day_etag(app_module):
+    first, second = app_module.add_students([
+        {"name": "Ann Lee", "grade": 9, "section": "A"},
+        {"name": "Bo Chan", "grade": 9, "section": "A"},
+    ])
+    client = app_module.app.test_client()
+    for url in (f"/api/attendance?date={DAY}", f"/api/attendance/summary?from={DAY}&to={DAY}"):
+        mark(app_module, first["id"])
+        etag = client.get(url).headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        mark(app_module, second["id"])
+        resp = client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+        app_module.clear_attendance(DAY)
+        assert client.get(url).headers["ETag"] != resp.headers["ETag"]
@@ -0,0 +1,97 @@
+import threading
+import time
+
+# --------------------
+# Group commit for single writes that arrive in bursts.
+#
+# Each caller queues its item and blocks until it has been applied. The first
+# waiter with nobody flushing becomes the leader: it waits up to `max_wait_ms`
+# for more items (or until `max_batch` are queued), hands the whole batch to
+# `apply` in one call, and wakes the others with their results. While it
+# flushes, new arrivals queue up for the next leader, so under load batches
+# grow on their own and the per-write cost (lock, journal record, fsync, sqlite
+# transaction) is paid once per batch. No background thread is involved, so it
+# works unchanged in forked workers.
+# --------------------
+class _Pending:
+    __slots__ = ("item", "done", "result", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.done = False
+        self.result = self.error = None
+
+
+class GroupCommitQueue:
+    def __init__(self, apply, max_batch=256, max_wait_ms=2):
+        # list of items -> list of results (same order). It must raise before changing
+        # anything, so a failed batch can be retried one item at a time.
+        self.apply = apply
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self._cond = threading.Condition()
+        self._pending = []
+        self._flushing = False
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item):
+        slot = _Pending(item)
+        with self._cond:
+            self._pending.append(slot)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+            while not slot.done:
+                if self._flushing:
+                    self._cond.wait()
+                else:
+                    self._lead()
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def _lead(self):
+        # called with the condition held; returns with it held again
+        self._flushing = True
+        try:
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            self._cond.release()
+            try:
+                self._apply(batch)
+            finally:
+                self._cond.acquire()
+            for s in batch:
+                s.done = True
+            self.batches += 1
+            self.items += len(batch)
+        finally:
+            self._flushing = False
+            self._cond.notify_all()
+
+    def _apply(self, batch):
+        try:
+            for s, r in zip(batch, self.apply([s.item for s in batch])):
+                s.result = r
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+                return
+        except BaseException as e:
+            # every caller in the batch gets the error, not a hang
+            for s in batch:
+                s.error = e
+            return
+        # one bad item must not fail the others: apply them one by one
+        for s in batch:
+            try:
+                s.result = self.apply([s.item])[0]
+            except BaseException as e:
+                s.error = e